@@ -5,12 +5,18 @@ from sqlmodel import  SQLModel
 from starlette.responses import JSONResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
-from db import engine
-from routers import recipes, web
+import catalog
+import settings
+from db import async_engine, engine
+from metrics import MetricsMiddleware
+from migrations import migrate
+from routers import metrics, recipes, web
+from snapshot import snapshot_server
 
 app = FastAPI(title="Recipe Finder")
 app.include_router(web.router)
 app.include_router(recipes.router)
+app.include_router(metrics.router)
 
 origins =[
     "http://localhost:8000",
@@ -24,10 +30,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*",]
 )
+# Per-route latency, response size and SQL use, served on /metrics
+app.add_middleware(MetricsMiddleware)
 
 @app.on_event("startup")
 def on_startup():
     SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    # Build the in-memory indexes once; writes keep them up to date
+    if settings.SNAPSHOT_PATH:
+        # From the mapped snapshot, which also serves the read endpoints
+        snapshot_server.start(engine, settings.SNAPSHOT_PATH)
+        # The rebuilt file has every change, deletions included
+        on_change = lambda version, recipe_ids: snapshot_server.refresh(version)
+    else:
+        catalog.load(engine)
+        on_change = lambda version, recipe_ids: (
+            catalog.load(engine) if recipe_ids is None else catalog.reload(engine, recipe_ids)
+        )
+    if settings.CATALOG_POLL_SECONDS:
+        catalog.version_watcher.start(engine, on_change, settings.CATALOG_POLL_SECONDS)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    catalog.version_watcher.stop()
+    snapshot_server.stop()
+    await async_engine.dispose()
 
 @app.middleware("http")
 async def add_recipes_cookie(request: Request, call_next):
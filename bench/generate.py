@@ -0,0 +1,83 @@
+"""
+Synthetic catalog generator, seeded from recipes.json.
+
+Ingredient lines follow a Zipf-like popularity curve (a few staples appear
+in most recipes, with a long tail of rare ones), recipe sizes follow the
+seed data, and vegetarian flags follow from the ingredients.
+
+    python -m bench.generate --count 100000 > catalog-100k.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Iterator
+
+from ingredient_index import normalize_ingredient
+
+SEED_FILE = Path(__file__).resolve().parent.parent / "recipes.json"
+
+STAPLES = [
+    "salt", "black pepper", "olive oil", "butter", "onion", "garlic clove", "egg", "plain flour",
+    "sugar", "milk", "lemon", "vegetable stock", "tomato", "parsley", "double cream", "cumin",
+    "paprika", "chilli flakes", "rice", "potato", "carrot", "celery", "thyme", "rosemary",
+    "parmesan", "cheddar", "spinach", "mushroom", "red pepper", "coriander", "ginger", "honey",
+    "soy sauce", "coconut milk", "chickpeas", "lentils", "basil", "oregano", "mozzarella", "yogurt",
+]
+MEATS = ["chicken thigh", "beef mince", "bacon", "pork shoulder", "lamb leg", "chorizo", "salmon fillet", "prawns"]
+MODIFIERS = ["", "", "", "fresh", "dried", "smoked", "ground", "toasted", "frozen", "organic", "unsalted", "ripe"]
+QUANTITIES = ["1", "2", "3", "1 tbsp", "2 tbsp", "1 tsp", "½ tsp", "100g", "250g", "400g", "150ml", "pinch of", "handful of"]
+DISHES = ["pie", "stew", "salad", "curry", "tart", "soup", "traybake", "risotto", "pasta", "bake", "stir-fry", "gratin"]
+STYLES = ["Spiced", "Roasted", "Easy", "Creamy", "Smoky", "Summer", "Winter", "Golden", "Herby", "One-pot", "Quick"]
+
+
+def _ingredient_pool(seed: list[dict]) -> list[str]:
+    bases = list(dict.fromkeys(
+        STAPLES + MEATS + [normalize_ingredient(line) for recipe in seed for line in recipe["ingredients"]]
+    ))
+    bases = [base for base in bases if base]
+    pool = [f"{modifier} {base}".strip() for base in bases for modifier in MODIFIERS]
+    # Unmodified staples lead the popularity ranking
+    return list(dict.fromkeys(bases + pool))
+
+
+def generate(count: int, seed: int = 0) -> Iterator[dict]:
+    """Yield `count` recipes in RecipeInput shape."""
+    rng = random.Random(seed)
+    seed_recipes = json.loads(SEED_FILE.read_text(encoding="utf-8"))
+    pool = _ingredient_pool(seed_recipes)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(pool))]
+    sizes = [len(recipe["ingredients"]) for recipe in seed_recipes if len(recipe["ingredients"]) > 3]
+    sentences = [
+        sentence.strip() + "."
+        for recipe in seed_recipes
+        for sentence in recipe["method"].split(".")
+        if len(sentence.strip()) > 20
+    ]
+
+    for number in range(count):
+        size = max(1, min(30, int(rng.choice(sizes) * rng.uniform(0.5, 1.5))))
+        names = list(dict.fromkeys(rng.choices(pool, weights, k=size)))
+        vegetarian = not any(meat in name for name in names for meat in MEATS)
+        main = next((name for name in names if name not in STAPLES), names[0])
+        rating = None if rng.random() < 0.05 else round(min(5.0, max(0.0, rng.gauss(4.2, 0.6))), 1)
+        yield {
+            "title": f"{rng.choice(STYLES)} {main} {rng.choice(DISHES)}",
+            "ingredients": [f"{rng.choice(QUANTITIES)} {name}" for name in names],
+            "method": " ".join(
+                f"Step {step} {sentence}" for step, sentence in enumerate(rng.sample(sentences, rng.randint(2, 5)), 1)
+            ),
+            "rating": rating,
+            "img": f"https://example.com/recipes/{seed}/{number}.jpg",
+            "vegetarian": vegetarian,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for recipe in generate(args.count, args.seed):
+        sys.stdout.write(json.dumps(recipe) + "\n")
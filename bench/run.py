@@ -0,0 +1,300 @@
+"""
+Latency/throughput benchmark for every endpoint, driven in-process through the ASGI app.
+
+Each catalog size runs in its own worker process against its own database,
+so settings and in-memory indexes never leak between sizes. Catalogs are
+generated and imported on first use and kept in bench/data/; every run works
+on a fresh copy, so the write scenarios never change what later runs measure.
+Results are written as JSON for later comparison.
+
+    python -m bench.run --sizes 10000 100000 --requests 200 --concurrency 8
+    python -m bench.run --compare bench/results/old.json bench/results/new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+DATA_DIR = BENCH_DIR / "data"
+RESULTS_DIR = BENCH_DIR / "results"
+
+SEARCH_TERMS = ["salt", "egg", "garlic", "lentils", "butter", "smoked paprika", "chicken thigh", "coconut milk", "ginger"]
+PANTRIES = [["egg", "milk", "plain flour", "butter", "sugar"], ["onion", "garlic", "tomato", "olive oil", "rice", "chickpeas"]]
+FULLTEXT_QUERIES = ["curry", "spiced pie", '"golden brown"', "roast*", "soup OR stew"]
+# Rarer ingredients keep the unpaginated HTML results to a realistic size
+MEAT_TERMS = ["chorizo", "lamb leg", "prawns", "salmon fillet"]
+
+
+def _recipe_body(rng: random.Random) -> dict:
+    return {
+        "title": f"Benchmark recipe {rng.getrandbits(48):x}",
+        "ingredients": rng.sample(SEARCH_TERMS, 4),
+        "method": "Mix everything and bake for 30 minutes.",
+        "rating": round(rng.uniform(1, 5), 1),
+        "img": "https://example.com/bench.jpg",
+        "vegetarian": rng.random() < 0.5,
+    }
+
+
+def scenarios(rng: random.Random, ids: list[int]) -> tuple[dict, list[int]]:
+    """
+    Map endpoint names to factories of one request as (method, url, keyword
+    arguments), plus the list the POST scenario's new ids should go into.
+    """
+    created: list[int] = []
+    return {
+        "GET /recipes/": lambda: ("GET", "/recipes/?limit=50", {}),
+        "GET /recipes/search": lambda: ("GET", "/recipes/search", {"params": {
+            "ingredients": rng.choice(SEARCH_TERMS), "rating": rng.choice([3.5, 4.0, 4.5]),
+            "vegetarian": rng.choice(["true", "false"]), "limit": 50,
+        }}),
+        "GET /recipes/ingresearch": lambda: ("GET", "/recipes/ingresearch", {"params": {
+            "keyword": ",".join(rng.sample(SEARCH_TERMS, rng.randint(1, 2))), "limit": 50,
+        }}),
+        "GET /recipes/ratesearch": lambda: ("GET", "/recipes/ratesearch", {"params": {
+            "rating": rng.choice([4.0, 4.5, 4.8]), "limit": 50,
+        }}),
+        "GET /recipes/vegsearch": lambda: ("GET", "/recipes/vegsearch", {"params": {
+            "vegetarian": rng.choice(["true", "false"]), "limit": 50,
+        }}),
+        "GET /recipes/fulltext": lambda: ("GET", "/recipes/fulltext", {"params": {"q": rng.choice(FULLTEXT_QUERIES)}}),
+        "POST /recipes/pantry": lambda: ("POST", "/recipes/pantry", {"json": {"ingredients": rng.choice(PANTRIES)}}),
+        "GET /recipes/{id}": lambda: ("GET", f"/recipes/{rng.choice(ids)}", {}),
+        "POST /recipes/": lambda: ("POST", "/recipes/", {"json": _recipe_body(rng)}),
+        "PUT /recipes/{id}": lambda: ("PUT", f"/recipes/{rng.choice(ids)}", {"json": _recipe_body(rng)}),
+        # Deletes consume the recipes created above, so run after POST
+        "DELETE /recipes/{id}": lambda: ("DELETE", f"/recipes/{created.pop() if created else ids[-1]}", {}),
+        "POST /search (form)": lambda: ("POST", "/search", {"data": {
+            "ingredients": rng.choice(SEARCH_TERMS), "rating": "4.8", "vegetarian": rng.choice(["yes", "no"]),
+        }}),
+        "POST /ingresearch (form)": lambda: ("POST", "/ingresearch", {"data": {"ingredients": rng.choice(MEAT_TERMS)}}),
+        "POST /ratesearch (form)": lambda: ("POST", "/ratesearch", {"data": {"rating": "5"}}),
+        "POST /vegsearch (form)": lambda: ("POST", "/vegsearch", {"data": {"vegetarian": rng.choice(["yes", "no"])}}),
+    }, created
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _measure(client, make_request, requests: int, concurrency: int, on_response=None) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            elif on_response is not None:
+                on_response(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 3),
+        "p50_ms": round(1000 * _percentile(latencies, 0.50), 3),
+        "p95_ms": round(1000 * _percentile(latencies, 0.95), 3),
+        "p99_ms": round(1000 * _percentile(latencies, 0.99), 3),
+    }
+
+
+def _catalog_path(size: int, seed: int) -> Path:
+    # Named apart from the catalogs of earlier versions, which the write scenarios changed
+    return DATA_DIR / f"base-{size}-{seed}.db"
+
+
+def _prepare_database(size: int, seed: int, run_path: str):
+    """Create and fill the catalog unless a previous run already did, then copy it to `run_path`."""
+    from db import make_engine
+
+    path = _catalog_path(size, seed)
+    engine = make_engine(str(path))
+    _fill_database(engine, size, seed)
+    # Fold the WAL into the main file, so copying that one file copies everything
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        Path(run_path + suffix).unlink(missing_ok=True)
+    shutil.copyfile(path, run_path)
+
+
+def _fill_database(engine, size: int, seed: int):
+    from sqlmodel import SQLModel, Session, func, select
+
+    from bench.generate import generate
+    from importer import upsert_batch
+    from migrations import migrate
+    from schemas import Recipe, RecipeInput
+
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with Session(engine) as session:
+        if session.exec(select(func.count()).select_from(Recipe)).one() >= size:
+            return
+        started = time.perf_counter()
+        batch = []
+        for record in generate(size, seed):
+            batch.append(RecipeInput.model_validate(record))
+            if len(batch) == 5000:
+                upsert_batch(session, batch)
+                batch = []
+        if batch:
+            upsert_batch(session, batch)
+        print(f"  imported {size} recipes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+async def _run_worker(args) -> list[dict]:
+    import httpx
+    from sqlmodel import Session, select
+
+    from db import engine
+    from schemas import Recipe
+
+    _prepare_database(args.size, args.seed, os.environ["RECIPES_DATABASE_PATH"])
+    with Session(engine) as session:
+        ids = list(session.exec(select(Recipe.id).limit(100_000)))
+
+    from app import app
+
+    rng = random.Random(args.seed)
+    requests, created = scenarios(rng, ids)
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, make_request in requests.items():
+                if args.endpoints and not any(pattern in name for pattern in args.endpoints):
+                    continue
+                on_response = None
+                if name == "POST /recipes/":
+                    on_response = lambda response: created.append(response.json()["id"])
+                stats = await _measure(client, make_request, args.requests, args.concurrency, on_response)
+                results.append({"endpoint": name, "catalog_size": args.size, **stats})
+                print(
+                    f"  {name:<28} {stats['throughput_rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f} ms"
+                    f"  p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path: str, new_path: str):
+    """Print the p95 change per endpoint and catalog size between two result files."""
+    def load(path):
+        data = json.loads(Path(path).read_text())
+        return {(row["endpoint"], row["catalog_size"]): row for row in data["results"]}
+
+    old, new = load(old_path), load(new_path)
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (key[1], key[0])):
+        before, after = old[key]["p95_ms"], new[key]["p95_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{key[1]:>9}  {key[0]:<28} p95 {before:>8.2f} -> {after:>8.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoints", nargs="*", help="only run endpoints whose name contains one of these")
+    parser.add_argument("--no-cache", action="store_true", help="disable the query result cache")
+    parser.add_argument("--snapshot", action="store_true", help="serve reads from a memory-mapped snapshot")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.worker:
+        # Not stdout: the app is free to print
+        Path(args.worker_output).write_text(json.dumps(asyncio.run(_run_worker(args))))
+        return
+
+    DATA_DIR.mkdir(exist_ok=True)
+    results = []
+    for size in args.sizes:
+        print(f"catalog size {size}", file=sys.stderr)
+        # The worker copies the catalog here before every run
+        env = dict(os.environ, RECIPES_DATABASE_PATH=str(DATA_DIR / f"run-{size}-{args.seed}.db"))
+        if args.no_cache:
+            env["RECIPES_CACHE_MAX_ENTRIES"] = "0"
+        if args.snapshot:
+            snapshot_path = DATA_DIR / f"catalog-{size}-{args.seed}.snapshot"
+            # Rebuilt at startup from the database as it is now
+            snapshot_path.unlink(missing_ok=True)
+            env["RECIPES_SNAPSHOT_PATH"] = str(snapshot_path)
+        worker_output = DATA_DIR / f"worker-{size}.json"
+        command = [
+            sys.executable, "-m", "bench.run", "--worker", "--size", str(size), "--seed", str(args.seed),
+            "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+            "--worker-output", str(worker_output),
+        ]
+        if args.endpoints:
+            command += ["--endpoints", *args.endpoints]
+        subprocess.run(command, cwd=ROOT, env=env, check=True)
+        results.extend(json.loads(worker_output.read_text()))
+        worker_output.unlink()
+
+    timestamp = datetime.now(timezone.utc)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{timestamp:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "meta": {
+            "timestamp": timestamp.isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+            "query_cache": not args.no_cache,
+            "snapshot": args.snapshot,
+            "seed": args.seed,
+        },
+        "results": results,
+    }, indent=2))
+    print(f"results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Change notifications for in-memory structures derived from the recipe table.
+
+Every code path that writes recipes calls `recipes_saved` / `recipes_removed`
+after its transaction commits; indexes and caches subscribe to keep in step.
+At startup `load` replays the stored catalog to them.
+
+Notifications only reach the process that made the write, so every write also
+bumps the stored catalog version and logs the recipe ids it touched under it
+(`record_changes`). `VersionWatcher` polls the version, and servers `reload`
+just those recipes after imports run from the command line or writes made by
+another worker, deletions included.
+"""
+import logging
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Iterable, NamedTuple, Protocol, Sequence
+
+from sqlalchemy import Engine, text
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRecord(Protocol):
+    """The fields listeners may rely on; RecipeOutput provides them."""
+    id: int
+    rating: float | None
+    vegetarian: bool
+    ingredients: Sequence[str]
+
+
+class StoredRecipe(NamedTuple):
+    """Lightweight CatalogRecord used when loading the catalog."""
+    id: int
+    rating: float | None
+    vegetarian: bool
+    ingredients: tuple[str, ...]
+
+
+class CatalogListener(Protocol):
+    def recipes_saved(self, recipes: Sequence[CatalogRecord]): ...
+
+    def recipes_removed(self, recipe_ids: list[int]): ...
+
+
+_listeners: list[CatalogListener] = []
+
+
+def subscribe(listener: CatalogListener) -> CatalogListener:
+    _listeners.append(listener)
+    return listener
+
+
+def recipes_saved(recipes: Sequence[CatalogRecord]):
+    """Announce created or updated recipes (with their committed state)."""
+    for listener in _listeners:
+        listener.recipes_saved(recipes)
+
+
+def recipes_removed(recipe_ids: list[int]):
+    for listener in _listeners:
+        listener.recipes_removed(recipe_ids)
+
+
+def _stored(session, query) -> Iterable[StoredRecipe]:
+    for (recipe_id, rating, vegetarian), rows in groupby(session.exec(query), key=itemgetter(0, 1, 2)):
+        yield StoredRecipe(recipe_id, rating, vegetarian, tuple(name for *_, name in rows if name is not None))
+
+
+def _query():
+    from sqlmodel import select
+    from schemas import Recipe, RecipeIngredient
+
+    return (
+        select(Recipe.id, Recipe.rating, Recipe.vegetarian, RecipeIngredient.name)
+        .outerjoin(RecipeIngredient)
+        .order_by(Recipe.id, RecipeIngredient.position)
+    )
+
+
+def load(engine: Engine, batch_size: int = 10_000):
+    """Announce every stored recipe, in batches, to build in-memory structures."""
+    from sqlmodel import Session
+
+    batch = []
+    with Session(engine) as session:
+        for recipe in _stored(session, _query().execution_options(yield_per=batch_size)):
+            batch.append(recipe)
+            if len(batch) == batch_size:
+                recipes_saved(batch)
+                batch = []
+    if batch:
+        recipes_saved(batch)
+
+
+def reload(engine: Engine, recipe_ids: Iterable[int], chunk_size: int = 500):
+    """Announce the stored state of `recipe_ids`: saved if still stored, removed otherwise."""
+    from sqlmodel import Session
+    from schemas import Recipe
+
+    recipe_ids = sorted(recipe_ids)
+    removed = []
+    with Session(engine) as session:
+        for start in range(0, len(recipe_ids), chunk_size):
+            chunk = recipe_ids[start:start + chunk_size]
+            saved = list(_stored(session, _query().where(Recipe.id.in_(chunk))))
+            stored = {recipe.id for recipe in saved}
+            removed += [recipe_id for recipe_id in chunk if recipe_id not in stored]
+            if saved:
+                recipes_saved(saved)
+    if removed:
+        recipes_removed(removed)
+
+
+# Versions bumped by this process, whose changes its listeners were already told about
+_own_versions: set[int] = set()
+_last_announced = 0
+
+_LOG_CHANGE = text(
+    "INSERT INTO catalogchange (version, recipe_id, changed_at) VALUES (:version, :recipe_id, :changed_at)"
+)
+
+
+def record_changes(session, recipe_ids: Iterable[int]) -> int:
+    """
+    Bump the catalog version and log `recipe_ids` under it, in the session's
+    transaction; call `version_announced` with the result once it commits.
+    """
+    version = session.execute(text(
+        "INSERT INTO catalogversion (id, version) VALUES (1, 1) "
+        "ON CONFLICT (id) DO UPDATE SET version = version + 1 RETURNING version"
+    )).scalar_one()
+    now = time.time()
+    rows = [{"version": version, "recipe_id": recipe_id, "changed_at": now} for recipe_id in set(recipe_ids)]
+    if rows:
+        session.execute(_LOG_CHANGE, rows)
+    return version
+
+
+def version_announced(version: int):
+    """Record that this process's listeners have seen the write that bumped `version`."""
+    global _last_announced
+    _own_versions.add(version)
+    _last_announced = max(_last_announced, version)
+
+
+def last_announced() -> int:
+    """
+    The newest version this process announced. Read from a listener, it is at
+    least the version of the write being notified, which is announced first.
+    """
+    return _last_announced
+
+
+def stored_version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT version FROM catalogversion WHERE id = 1")).scalar() or 0
+
+
+def changes(engine: Engine, after: int, until: int) -> dict[int, set[int]]:
+    """The recipe ids logged under each version in (after, until]; pruned versions are absent."""
+    logged: dict[int, set[int]] = {}
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT version, recipe_id FROM catalogchange WHERE version > :after AND version <= :until"),
+            {"after": after, "until": until},
+        )
+        for version, recipe_id in rows:
+            logged.setdefault(version, set()).add(recipe_id)
+    return logged
+
+
+def prune_changes(engine: Engine, before: float):
+    """Forget versions logged before the `before` timestamp."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM catalogchange WHERE version < coalesce("
+            "(SELECT version FROM catalogchange WHERE changed_at >= :before ORDER BY version LIMIT 1), "
+            "(SELECT max(version) + 1 FROM catalogchange))"
+        ), {"before": before})
+
+
+class VersionWatcher:
+    """
+    Polls the stored catalog version and, when another process has written
+    recipes, calls `on_change` with the new version and the ids of the recipes
+    written since the last call. The ids are None when part of the change log
+    was already pruned, and everything has to be reloaded.
+    """
+
+    # Seconds between prunes of the change log
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self):
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, engine: Engine, on_change: Callable[[int, set[int] | None], None], interval: float):
+        self._engine, self._on_change, self._interval = engine, on_change, interval
+        self._seen = stored_version(engine)
+        self._thread = threading.Thread(target=self._watch, name="catalog-version-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _watch(self):
+        pruned = time.monotonic()
+        while not self._stopped.wait(self._interval):
+            try:
+                version = stored_version(self._engine)
+                if version != self._seen:
+                    self._catch_up(version)
+                if time.monotonic() - pruned > self.PRUNE_INTERVAL:
+                    pruned = time.monotonic()
+                    prune_changes(self._engine, time.time() - settings.CATALOG_CHANGE_RETENTION_SECONDS)
+            except Exception:
+                logger.exception("catalog version check failed")
+
+    def _catch_up(self, version: int):
+        foreign = [number for number in range(self._seen + 1, version + 1) if number not in _own_versions]
+        # Versions announced late (after this check already passed them) are dropped here too
+        _own_versions.difference_update([number for number in _own_versions if number <= version])
+        if foreign:
+            logged = changes(self._engine, self._seen, version)
+            if all(number in logged for number in foreign):
+                recipe_ids = set().union(*(logged[number] for number in foreign))
+                logger.info("catalog version %d: %d recipes written by another process", version, len(recipe_ids))
+                self._on_change(version, recipe_ids)
+            else:
+                logger.warning("catalog version %d: change log already pruned, reloading everything", version)
+                self._on_change(version, None)
+        self._seen = version
+
+
+version_watcher = VersionWatcher()
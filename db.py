@@ -1,12 +1,49 @@
-from sqlmodel import create_engine, Session
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-engine = create_engine(
-    "sqlite:///recipes.db",
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=True  # Log generated SQL
-)
+import settings
+from metrics import instrument_engine
 
 
-def get_session():
-    with Session(engine) as session:
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer holds the lock
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    # Negative values are in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def make_engine(path: str = settings.DATABASE_PATH, echo: bool = settings.SQL_ECHO) -> Engine:
+    """Sync engine, used for startup, migrations and bulk imports."""
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},  # Needed for SQLite
+        echo=echo  # Log generated SQL
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    instrument_engine(engine, "sync")
+    return engine
+
+
+def make_async_engine(path: str = settings.DATABASE_PATH, echo: bool = settings.SQL_ECHO) -> AsyncEngine:
+    """aiosqlite engine used by the request handlers."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", echo=echo)
+    event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    instrument_engine(engine.sync_engine, "async")
+    return engine
+
+
+engine = make_engine()
+async_engine = make_async_engine()
+
+
+async def get_async_session():
+    # Keep committed objects readable without another round trip
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
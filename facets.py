@@ -0,0 +1,156 @@
+"""
+Facet counts for the search sidebar, kept up to date from catalog notifications.
+
+Counts per (vegetarian, rating) cell, and ingredient counts per flag and per
+cell, are adjusted on every write, so facets filtered by flag and minimum
+rating only add up the matching cells. An ingredient filter is tallied from
+the in-memory copy of each matched recipe, never with COUNT queries.
+"""
+import heapq
+from bisect import bisect_right
+from collections import Counter
+from threading import Lock
+from typing import Iterable, NamedTuple, Sequence
+
+import catalog
+from ingredient_index import normalize_ingredient
+
+RATING_BUCKETS = ("0-1", "1-2", "2-3", "3-4", "4-5")
+UNRATED = "unrated"
+
+
+class _Entry(NamedTuple):
+    rating: float | None
+    vegetarian: bool
+    ingredients: tuple[str, ...]  # Distinct normalized names
+
+
+def rating_bucket(rating: float | None) -> str:
+    if rating is None:
+        return UNRATED
+    # 5 belongs to the top bucket
+    return RATING_BUCKETS[max(0, min(int(rating), len(RATING_BUCKETS) - 1))]
+
+
+def _passes(cell: tuple[bool, float | None], rating: float | None, vegetarian: bool | None) -> bool:
+    flag, cell_rating = cell
+    if vegetarian is not None and flag != vegetarian:
+        return False
+    return rating is None or (cell_rating is not None and cell_rating >= rating)
+
+
+def _sort_key(rating: float | None, recipe_id: int) -> tuple:
+    # Mirrors pagination.keyset_ranges for SortOrder.rating: best first, newest first on ties, unrated last
+    return (rating is None, -(rating or 0.0), -recipe_id)
+
+
+class FacetIndex:
+    """Per-recipe rating, vegetarian flag and ingredients, with running totals over them."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._recipes: dict[int, _Entry] = {}
+        self._cells: Counter[tuple[bool, float | None]] = Counter()
+        # Keyed by vegetarian flag; None counts every recipe
+        self._ingredients: dict[bool | None, Counter[str]] = {None: Counter(), True: Counter(), False: Counter()}
+        # The same split by cell, for a minimum rating
+        self._cell_ingredients: dict[tuple[bool, float | None], Counter[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def recipes_saved(self, recipes: Sequence[catalog.CatalogRecord]):
+        with self._lock:
+            for recipe in recipes:
+                self._remove(recipe.id)
+                names = tuple(dict.fromkeys(filter(None, map(normalize_ingredient, recipe.ingredients))))
+                entry = _Entry(recipe.rating, recipe.vegetarian, names)
+                self._recipes[recipe.id] = entry
+                self._count(entry, 1)
+
+    def recipes_removed(self, recipe_ids: list[int]):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+
+    def facets(
+        self,
+        ids: set[int] | None = None,
+        rating: float | None = None,
+        vegetarian: bool | None = None,
+        top: int = 10,
+    ) -> dict:
+        """
+        Counts by vegetarian flag and rating bucket, plus the `top` most common
+        ingredients, over the recipes passing the filters. `ids` restricts
+        the count to an ingredient index match.
+        """
+        with self._lock:
+            if ids is None:
+                cells = {cell: count for cell, count in self._cells.items() if _passes(cell, rating, vegetarian)}
+                if rating is None:
+                    counts = self._ingredients[vegetarian]
+                else:
+                    counts = Counter()
+                    for cell in cells:
+                        counts.update(self._cell_ingredients[cell])
+                ingredients = heapq.nlargest(top, counts.items(), key=lambda item: item[1])
+            else:
+                cells, ingredients = self._tally(ids, rating, vegetarian, top)
+
+        by_flag = {"true": 0, "false": 0}
+        by_rating = dict.fromkeys(RATING_BUCKETS + (UNRATED,), 0)
+        for (flag, cell_rating), count in cells.items():
+            by_flag["true" if flag else "false"] += count
+            by_rating[rating_bucket(cell_rating)] += count
+        return {
+            "total": sum(cells.values()),
+            "vegetarian": by_flag,
+            "rating": by_rating,
+            "ingredients": [{"name": name, "count": count} for name, count in ingredients],
+        }
+
+    def order_by_rating(self, ids: Iterable[int], after: list | None = None) -> list[int]:
+        """`ids` in SortOrder.rating order, skipping everything up to and including the `after` key."""
+        with self._lock:
+            keys = sorted(_sort_key(self._rating(recipe_id), recipe_id) for recipe_id in ids)
+        if after is not None:
+            keys = keys[bisect_right(keys, _sort_key(*after)):]
+        return [-key[2] for key in keys]
+
+    def _rating(self, recipe_id: int) -> float | None:
+        entry = self._recipes.get(recipe_id)
+        return entry.rating if entry is not None else None
+
+    def _tally(self, ids, rating, vegetarian, top):
+        cells: Counter = Counter()
+        ingredients: Counter = Counter()
+        entries = filter(None, map(self._recipes.get, ids))
+        for entry in entries:
+            if not _passes((entry.vegetarian, entry.rating), rating, vegetarian):
+                continue
+            cells[entry.vegetarian, entry.rating] += 1
+            ingredients.update(entry.ingredients)
+        return cells, ingredients.most_common(top)
+
+    def _count(self, entry: _Entry, delta: int):
+        cell = entry.vegetarian, entry.rating
+        self._cells[cell] += delta
+        if not self._cells[cell]:
+            del self._cells[cell]
+        by_cell = self._cell_ingredients.setdefault(cell, Counter())
+        for counts in (self._ingredients[None], self._ingredients[entry.vegetarian], by_cell):
+            for name in entry.ingredients:
+                counts[name] += delta
+                if not counts[name]:
+                    del counts[name]
+        if cell not in self._cells:
+            del self._cell_ingredients[cell]
+
+    def _remove(self, recipe_id: int):
+        entry = self._recipes.pop(recipe_id, None)
+        if entry is not None:
+            self._count(entry, -1)
+
+
+facet_index = catalog.subscribe(FacetIndex())
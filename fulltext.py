@@ -0,0 +1,105 @@
+"""
+Full-text search over recipe titles, methods and ingredients (SQLite FTS5).
+
+`recipe_fts` shadows the recipe and recipeingredient tables. Every write path
+calls `refresh` with the recipes it touched, in its own transaction, so each
+recipe's document is rewritten once per write however many ingredient rows
+changed. Rows share their rowid with recipe.id.
+"""
+from typing import Iterable
+
+from sqlalchemy import Connection, bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# bm25 weights for (title, method, ingredients): title hits count most
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+# Recipe ids per refresh statement, well below SQLite's bound-variable limit
+REFRESH_CHUNK_SIZE = 500
+
+_INGREDIENT_TEXT = """(
+    SELECT group_concat(name, ' ') FROM (
+        SELECT name FROM recipeingredient WHERE recipe_id = {recipe_id} ORDER BY position
+    )
+)"""
+
+_DOCUMENTS = (
+    "INSERT INTO recipe_fts (rowid, title, method, ingredients) "
+    f"SELECT id, title, method, coalesce({_INGREDIENT_TEXT.format(recipe_id='recipe.id')}, '') FROM recipe"
+)
+_DELETE = text("DELETE FROM recipe_fts WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True))
+_INSERT = text(_DOCUMENTS + " WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+# Per-row triggers from earlier versions; they rewrote a recipe's document once per ingredient line
+_OLD_TRIGGERS = (
+    "recipe_fts_insert", "recipe_fts_update", "recipe_fts_delete",
+    "recipe_fts_ingredient_insert", "recipe_fts_ingredient_update", "recipe_fts_ingredient_delete",
+)
+
+
+def create_fulltext_index(conn: Connection):
+    """Create and populate recipe_fts if the database does not have it yet."""
+    for trigger in _OLD_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_fts'"
+    ).first()
+    if exists:
+        return
+    conn.exec_driver_sql(
+        """CREATE VIRTUAL TABLE recipe_fts USING fts5(
+            title, method, ingredients, tokenize = 'porter unicode61 remove_diacritics 2'
+        )"""
+    )
+    conn.exec_driver_sql(_DOCUMENTS)
+
+
+def refresh(session: Session | Connection, recipe_ids: Iterable[int]):
+    """
+    Rewrite the documents of created, updated or deleted recipes from the tables,
+    in the caller's transaction. Async callers go through `session.run_sync`.
+    """
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), REFRESH_CHUNK_SIZE):
+        chunk = recipe_ids[start:start + REFRESH_CHUNK_SIZE]
+        session.execute(_DELETE, {"ids": chunk})
+        session.execute(_INSERT, {"ids": chunk})
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+async def search(
+    session: AsyncSession, query: str, after: list | None = None, limit: int = 20
+) -> list[tuple[int, float]]:
+    """
+    Return (recipe_id, score) pairs for an FTS5 query, best match first.
+
+    Scores are bm25 values (lower is better). `after` is the (score, id) of
+    the last row of the previous page.
+    """
+    params = {"query": query, "limit": limit, "score": None, "id": None}
+    where = ""
+    if after is not None:
+        params["score"], params["id"] = after
+        where = "WHERE score > :score OR (score = :score AND id > :id)"
+    # MATERIALIZED stops SQLite from pushing the keyset filter into the FTS scan,
+    # where comparisons against bm25() with bound parameters match nothing
+    statement = text(f"""
+        WITH ranked AS MATERIALIZED (
+            SELECT rowid AS id, bm25(recipe_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS score
+            FROM recipe_fts WHERE recipe_fts MATCH :query
+        )
+        SELECT id, score FROM ranked
+        {where}
+        ORDER BY score, id
+        LIMIT :limit
+    """)
+    try:
+        result = await session.execute(statement, params)
+    except OperationalError as exc:
+        # FTS5 reports malformed queries (unbalanced quotes, stray operators) this way
+        raise QuerySyntaxError(str(exc.orig)) from exc
+    return [(recipe_id, score) for recipe_id, score in result]
@@ -0,0 +1,224 @@
+"""
+Bulk catalog import for recipes.json-style dumps.
+
+Accepts either a JSON array of recipes or JSON Lines, read incrementally so the
+file never has to fit in memory. Recipes are upserted on (title, img) in large
+transactions, which makes re-running an import idempotent. Each transaction
+logs the recipes it wrote under a new catalog version, so running servers
+reload them into their in-memory indexes and caches (see catalog.VersionWatcher).
+
+    python importer.py recipes.json [--batch-size 5000]
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Iterable, Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+import catalog
+import fulltext
+from db import engine
+from schemas import ImportReport, Recipe, RecipeIngredient, RecipeInput, RecipeOutput
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+# Only the first few validation errors are reported back
+MAX_REPORTED_ERRORS = 20
+# Keys per (title, img) IN (...) lookup, two bound variables each
+KEY_CHUNK_SIZE = 400
+
+# Longest single record accepted; bounds the read-ahead for one that never closes
+MAX_RECORD_CHARS = 16 * 1024 * 1024
+
+_SEPARATORS = " \t\r\n,"
+# Longer than any literal, or any number a recipe holds
+_MAX_PARTIAL_TOKEN = 32
+
+
+class MalformedRecord(ValueError):
+    """The stream holds something that is not JSON; nothing after it can be read."""
+
+
+def _truncated(buffer: str, error: json.JSONDecodeError) -> bool:
+    # A record cut off by the end of the buffer fails inside its last token (at most a
+    # few characters from the end) or inside a string running to the end; an error
+    # anywhere else is in the data itself, and reading more cannot fix it
+    return error.msg.startswith("Unterminated string") or len(buffer) - error.pos <= _MAX_PARTIAL_TOKEN
+
+
+def iter_records(fp: TextIO, chunk_size: int = 1 << 16) -> Iterator[object]:
+    """
+    Yield the top-level values of a JSON array or a JSON Lines stream, one at a time.
+
+    Raises MalformedRecord, after yielding everything before it, at the first
+    value that is not valid JSON or is longer than MAX_RECORD_CHARS.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    in_array = None
+    count = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer, pos = fp.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            pos += in_array
+            continue
+        if in_array and buffer[pos] == "]":
+            return
+
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as exc:
+            if eof or not _truncated(buffer, exc):
+                raise MalformedRecord(f"record {count}: invalid JSON ({exc.msg})") from None
+            if len(buffer) - pos > MAX_RECORD_CHARS:
+                raise MalformedRecord(f"record {count}: longer than {MAX_RECORD_CHARS} characters") from None
+            # The record straddles the end of the buffer: read more and retry
+            chunk = fp.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        count += 1
+        yield record
+
+
+def _batches(records: Iterable[object], size: int) -> Iterator[list[object]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def existing_ids(session: Session, keys: list[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """Map each (title, img) key already in use to its recipe id."""
+    found = {}
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        chunk = keys[start:start + KEY_CHUNK_SIZE]
+        query = select(Recipe.id, Recipe.title, Recipe.img).where(tuple_(Recipe.title, Recipe.img).in_(chunk))
+        for recipe_id, title, img in session.execute(query):
+            found[(title, img)] = recipe_id
+    return found
+
+
+def _upsert(session: Session, statement, rows: list[dict]) -> dict[tuple[str, str], int]:
+    # Without render_nulls, rows with and without a rating would go in separate statements
+    statement = statement.returning(Recipe.id, Recipe.title, Recipe.img).execution_options(render_nulls=True)
+    return {(title, img): recipe_id for recipe_id, title, img in session.execute(statement, rows)}
+
+
+def upsert_batch(session: Session, recipes: list[RecipeInput]) -> tuple[int, int]:
+    """Insert or update a batch of recipes in the session's transaction. Returns (inserted, updated)."""
+    # Later duplicates within a batch win, as they would with one request per row
+    by_key = {(recipe.title, recipe.img): recipe for recipe in recipes}
+    rows = [
+        {"title": r.title, "method": r.method, "rating": r.rating, "img": r.img, "vegetarian": r.vegetarian}
+        for r in by_key.values()
+    ]
+
+    # New keys first: the INSERT takes the write lock, so every key it skips
+    # already exists and stays put until commit, and goes through DO UPDATE
+    ids = _upsert(session, sqlite_insert(Recipe).on_conflict_do_nothing(index_elements=["title", "img"]), rows)
+    inserted = len(ids)
+    existing = [row for row in rows if (row["title"], row["img"]) not in ids]
+    if existing:
+        statement = sqlite_insert(Recipe)
+        statement = statement.on_conflict_do_update(
+            index_elements=["title", "img"],
+            set_={column: statement.excluded[column] for column in ("method", "rating", "vegetarian")},
+        )
+        updated = _upsert(session, statement, existing)
+        session.execute(delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(list(updated.values()))))
+        ids.update(updated)
+
+    ingredient_rows = [
+        {"recipe_id": ids[key], "position": position, "name": name}
+        for key, recipe in by_key.items()
+        for position, name in enumerate(recipe.ingredients)
+    ]
+    if ingredient_rows:
+        session.execute(insert(RecipeIngredient), ingredient_rows)
+    fulltext.refresh(session, ids.values())
+
+    version = catalog.record_changes(session, ids.values())
+    session.commit()
+    catalog.version_announced(version)
+    catalog.recipes_saved([RecipeOutput(id=ids[key], **recipe.model_dump()) for key, recipe in by_key.items()])
+    return inserted, len(existing)
+
+
+def _until_malformed(records: Iterator[object], report: ImportReport) -> Iterator[object]:
+    try:
+        yield from records
+    except MalformedRecord as exc:
+        report.stopped = str(exc)
+    except UnicodeDecodeError as exc:
+        report.stopped = f"not UTF-8 text ({exc.reason})"
+
+
+def import_stream(fp: TextIO, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """
+    Validate and upsert every recipe in `fp`, committing once per batch.
+
+    A record that is not valid JSON ends the import: the recipes before it are
+    still written, and `stopped` in the report says where it ended.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    with Session(engine) as session:
+        for offset, batch in enumerate(_batches(_until_malformed(iter_records(fp), report), batch_size)):
+            valid = []
+            for position, record in enumerate(batch, start=offset * batch_size):
+                try:
+                    recipe = RecipeInput.model_validate(record)
+                except ValidationError as exc:
+                    report.failed += 1
+                    if len(report.errors) < MAX_REPORTED_ERRORS:
+                        report.errors.append(f"record {position}: {exc.errors()[0]['msg']}")
+                    continue
+                recipe.title = recipe.title.strip()
+                valid.append(recipe)
+
+            if valid:
+                inserted, updated = upsert_batch(session, valid)
+                report.inserted += inserted
+                report.updated += updated
+            report.seconds = time.perf_counter() - started
+            logger.info("imported %d recipes (%.0f/s)", report.processed, report.recipes_per_second)
+    return report
+
+
+if __name__ == "__main__":
+    from sqlmodel import SQLModel
+
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="JSON array or JSON Lines file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    with open(args.path, encoding="utf-8") as fp:
+        result = import_stream(fp, args.batch_size)
+    print(result.model_dump_json(indent=2))
+    if result.stopped:
+        raise SystemExit(1)
@@ -0,0 +1,168 @@
+import re
+import unicodedata
+from functools import lru_cache
+from threading import Lock
+from typing import Iterable
+
+import catalog
+
+_WORD_RE = re.compile(r"[a-z]+")
+# Letters NFKD leaves whole
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss", "ø": "o", "ł": "l"})
+
+# Quantities, units and filler words that carry no meaning for ingredient search
+STOPWORDS = frozenset({
+    "a", "an", "and", "or", "of", "to", "for", "with", "the", "in", "into", "about",
+    "g", "kg", "mg", "ml", "l", "oz", "lb", "lbs", "tsp", "tbsp", "cup", "cups",
+    "pinch", "handful", "large", "small", "medium", "piece", "pieces", "quantity",
+    "finely", "roughly", "chopped", "sliced", "diced", "grated", "peeled",
+})
+
+
+def _stem(word: str) -> str:
+    """Fold simple plurals so "eggs" and "egg" share a posting list."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents, so "Crème fraîche" matches "creme fraiche"."""
+    text = unicodedata.normalize("NFKD", text.lower().translate(_LIGATURES))
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def _words(text: str) -> list[str]:
+    text = _fold(text)
+    return [
+        _stem(word)
+        for word in _WORD_RE.findall(text)
+        if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+@lru_cache(maxsize=1 << 16)
+def tokenize(text: str) -> frozenset[str]:
+    """Split an ingredient (or a search term) into normalized word tokens."""
+    # Catalogs repeat the same ingredient lines endlessly, hence the cache
+    return frozenset(_words(text))
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_ingredient(name: str) -> str:
+    """
+    Canonical form of an ingredient line, e.g. "250g Red split lentils" -> "red split lentil".
+
+    The facet and similarity indexes count and compare lines by this name.
+    """
+    return " ".join(dict.fromkeys(_words(name)))
+
+
+def parse_terms(query: str) -> list[frozenset[str]]:
+    """Split a comma-separated search string into one token set per term."""
+    terms = (tokenize(term) for term in query.split(","))
+    return [term for term in terms if term]
+
+
+class IngredientIndex:
+    """
+    In-memory inverted index from ingredient token to recipe ids.
+
+    Each posting also records which of the recipe's lines hold the token (bit i
+    for line i), so that a multi-word term only matches when a single line
+    has all of its words: "red lentil" must not match "1 red onion" plus
+    "200g green lentils".
+    """
+
+    def __init__(self):
+        self._postings: dict[str, dict[int, int]] = {}
+        self._tokens: dict[int, frozenset[str]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def add(self, recipe_id: int, ingredients: Iterable[str]):
+        """Index a new recipe, or re-index an updated one."""
+        with self._lock:
+            self._remove(recipe_id)
+            self._add(recipe_id, ingredients)
+
+    def remove(self, recipe_id: int):
+        with self._lock:
+            self._remove(recipe_id)
+
+    def recipes_saved(self, recipes):
+        for recipe in recipes:
+            self.add(recipe.id, recipe.ingredients)
+
+    def recipes_removed(self, recipe_ids: list[int]):
+        for recipe_id in recipe_ids:
+            self.remove(recipe_id)
+
+    def lookup(self, query: str, match_all: bool = True) -> set[int]:
+        """
+        Return the ids of recipes matching a comma-separated ingredient query.
+
+        A term matches when one ingredient line has every token of it; terms
+        are then combined with AND (match_all) or OR.
+        """
+        terms = parse_terms(query)
+        if not terms:
+            return set()
+        with self._lock:
+            matches = [self._intersect(term) for term in terms]
+        if match_all:
+            return self._intersect_sets(matches)
+        return set().union(*matches)
+
+    def _add(self, recipe_id: int, ingredients: Iterable[str]):
+        lines: dict[str, int] = {}
+        for position, item in enumerate(ingredients):
+            for token in tokenize(item):
+                lines[token] = lines.get(token, 0) | 1 << position
+        self._tokens[recipe_id] = frozenset(lines)
+        for token, mask in lines.items():
+            self._postings.setdefault(token, {})[recipe_id] = mask
+
+    def _remove(self, recipe_id: int):
+        for token in self._tokens.pop(recipe_id, ()):
+            posting = self._postings[token]
+            del posting[recipe_id]
+            if not posting:
+                del self._postings[token]
+
+    def _intersect(self, tokens: frozenset[str]) -> set[int]:
+        postings = [self._postings.get(token) for token in tokens]
+        if not all(postings):
+            return set()
+        candidates = self._intersect_sets([posting.keys() for posting in postings])
+        if len(postings) == 1:
+            return candidates
+        # Recipes with every token; keep those where one line has them all
+        result = set()
+        for recipe_id in candidates:
+            mask = -1
+            for posting in postings:
+                mask &= posting[recipe_id]
+            if mask:
+                result.add(recipe_id)
+        return result
+
+    @staticmethod
+    def _intersect_sets(postings: list) -> set[int]:
+        # Start from the shortest posting list so every step shrinks the result
+        postings = sorted(postings, key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+
+ingredient_index = catalog.subscribe(IngredientIndex())
@@ -0,0 +1,224 @@
+"""
+Request and SQL instrumentation, exposed in the Prometheus text format.
+
+`MetricsMiddleware` times every request and counts the SQL statements it
+runs; `instrument_engine` hooks SQLAlchemy's cursor events so statements are
+timed on whichever engine runs them. Per-request totals are kept in a context
+variable, which follows the request into the async engine's greenlets and
+into threadpool calls.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Sequence
+
+from sqlalchemy import Engine, event
+
+import settings
+
+slow_query_log = logging.getLogger("recipes.slow_query")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(9))  # 256 B .. 16 MiB
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = Lock()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines += self._samples()
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative bucket counts (the last one is +Inf) and the sum
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = entry
+            counts[bucket] += 1
+            total[0] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("recipes_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram(
+    "recipes_http_request_duration_seconds", "Time to send the full response.", ("method", "route")
+)
+RESPONSE_BYTES = Histogram(
+    "recipes_http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge("recipes_http_requests_in_flight", "Requests currently being handled.")
+REQUEST_QUERIES = Histogram(
+    "recipes_http_request_sql_queries", "SQL statements run per request.", ("method", "route"), COUNT_BUCKETS
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "recipes_http_request_sql_seconds", "Time spent in SQL per request.", ("method", "route")
+)
+QUERY_SECONDS = Histogram("recipes_sql_query_duration_seconds", "SQL statement execution time.", ("engine",))
+SLOW_QUERIES = Counter("recipes_sql_slow_queries_total", "SQL statements slower than the slow-query threshold.", ("engine",))
+
+REGISTRY: list[_Metric] = [
+    REQUESTS, REQUEST_SECONDS, RESPONSE_BYTES, IN_FLIGHT, REQUEST_QUERIES, REQUEST_SQL_SECONDS, QUERY_SECONDS, SLOW_QUERIES,
+]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class _SqlTally:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_sql: ContextVar[_SqlTally | None] = ContextVar("request_sql", default=None)
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Time every statement `engine` runs; for an AsyncEngine pass its `sync_engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        QUERY_SECONDS.observe(elapsed, name)
+        tally = _request_sql.get()
+        if tally is not None:
+            tally.queries += 1
+            tally.seconds += elapsed
+        if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            SLOW_QUERIES.inc(name)
+            slow_query_log.warning("%.1f ms on %s engine: %s", elapsed * 1000, name, " ".join(statement.split()))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, response size and SQL use per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        tally = _SqlTally()
+        token = _request_sql.set(tally)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _request_sql.reset(token)
+            # Route templates rather than raw paths keep the label set bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            RESPONSE_BYTES.observe(size, method, route)
+            REQUEST_QUERIES.observe(tally.queries, method, route)
+            REQUEST_SQL_SECONDS.observe(tally.seconds, method, route)
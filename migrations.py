@@ -0,0 +1,104 @@
+"""
+Idempotent schema upgrades for databases created by older versions of the app.
+
+`SQLModel.metadata.create_all` only creates missing tables; anything that has
+to change an existing table lives here. Run on startup, or by hand with
+`python migrations.py`.
+"""
+from sqlalchemy import Connection, Engine, bindparam, text
+from sqlmodel import SQLModel
+
+import catalog
+from fulltext import create_fulltext_index, refresh
+
+# Recipes deleted per statement, one bound variable each
+DELETE_CHUNK_SIZE = 500
+
+_DELETE_INGREDIENTS = text("DELETE FROM recipeingredient WHERE recipe_id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+_DELETE_RECIPES = text("DELETE FROM recipe WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def move_ingredients_to_child_table(conn: Connection):
+    """Split the legacy comma-joined recipe.ingredients column into recipeingredient rows."""
+    if "ingredients" not in _columns(conn, "recipe"):
+        return
+
+    params = [
+        {"recipe_id": recipe_id, "position": position, "name": name}
+        for recipe_id, ingredients in conn.execute(text("SELECT id, ingredients FROM recipe"))
+        for position, name in enumerate(ingredients.split(", "))
+        if name
+    ]
+    if params:
+        conn.execute(
+            text("INSERT INTO recipeingredient (recipe_id, position, name) VALUES (:recipe_id, :position, :name)"),
+            params,
+        )
+    # Needs SQLite >= 3.35
+    conn.exec_driver_sql("ALTER TABLE recipe DROP COLUMN ingredients")
+
+
+def drop_unused_indexes(conn: Connection):
+    """Drop indexes no query reads, which every write would otherwise maintain."""
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_recipeingredient_normalized")
+
+
+def drop_unused_columns(conn: Connection):
+    """Drop columns nothing reads; the ingredient indexes re-derive normalized names from the lines."""
+    if "normalized" in _columns(conn, "recipeingredient"):
+        conn.exec_driver_sql("ALTER TABLE recipeingredient DROP COLUMN normalized")
+
+
+def deduplicate_recipes(conn: Connection):
+    """
+    Make (title, img) unique. Of recipes sharing a key, keep the newest, which is
+    the one imports were updating, and delete the rest.
+    """
+    indexes = conn.exec_driver_sql("PRAGMA index_list(recipe)")
+    if any(name == "ix_recipe_title_img" and unique for _, name, unique, *_ in indexes):
+        return
+    duplicates = list(conn.execute(text(
+        "SELECT id FROM recipe WHERE id NOT IN (SELECT max(id) FROM recipe GROUP BY title, img)"
+    )).scalars())
+    for start in range(0, len(duplicates), DELETE_CHUNK_SIZE):
+        chunk = {"ids": duplicates[start:start + DELETE_CHUNK_SIZE]}
+        conn.execute(_DELETE_INGREDIENTS, chunk)
+        conn.execute(_DELETE_RECIPES, chunk)
+    if duplicates:
+        refresh(conn, duplicates)
+        # Running servers and snapshot files still hold the deleted recipes
+        catalog.record_changes(conn, duplicates)
+    # create_missing_indexes puts it back as a unique index
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_recipe_title_img")
+
+
+def create_missing_indexes(conn: Connection):
+    """Create indexes declared on tables that already existed when they were added."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def migrate(engine: Engine):
+    """Apply every pending migration in a single transaction."""
+    with engine.begin() as conn:
+        drop_unused_indexes(conn)
+        drop_unused_columns(conn)
+        move_ingredients_to_child_table(conn)
+        create_fulltext_index(conn)
+        deduplicate_recipes(conn)
+        create_missing_indexes(conn)
+
+
+if __name__ == "__main__":
+    from db import engine
+    import schemas  # noqa: F401  (registers the tables)
+
+    SQLModel.metadata.create_all(engine)
+    migrate(engine)
@@ -0,0 +1,115 @@
+import base64
+import binascii
+import json
+import math
+from enum import Enum
+
+from fastapi import HTTPException, Query
+from sqlalchemy import UnaryExpression
+from sqlalchemy.sql import operators
+from sqlmodel.sql.expression import SelectOfScalar
+
+from schemas import Recipe
+
+MAX_PAGE_SIZE = 1000
+# Rows fetched from the database cursor per round trip when streaming
+STREAM_BATCH_SIZE = 500
+
+
+class SortOrder(str, Enum):
+    id = "id"  # oldest first
+    rating = "rating"  # best rated first, unrated last
+
+
+class PageParams:
+    """Query parameters shared by every list endpoint."""
+
+    def __init__(
+        self,
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for everything"),
+        cursor: str | None = Query(None, description="Value of X-Next-Cursor from the previous page"),
+        stream: bool = Query(False, description="Stream the results as NDJSON"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.stream = stream
+
+
+def encode_key(key: list) -> str:
+    """Wrap a sort key as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+# Types each value of a decoded sort key may have
+ID = (int,)
+NUMBER = (int, float)
+OPTIONAL_NUMBER = (int, float, type(None))
+
+
+def _valid(value, types: tuple) -> bool:
+    # bool is an int subclass; NaN and infinities do not order like stored values
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def decode_key(cursor: str, *fields: tuple) -> list:
+    """Unwrap a cursor made by encode_key, checking it holds one value of each of the `fields` types."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+    if not isinstance(key, list) or len(key) != len(fields) or not all(map(_valid, key, fields)):
+        raise HTTPException(status_code=400, detail="Cursor does not match the sort order")
+    return key
+
+
+def encode_cursor(recipe: Recipe, order: SortOrder) -> str:
+    return encode_key([recipe.id] if order is SortOrder.id else [recipe.rating, recipe.id])
+
+
+def decode_cursor(cursor: str, order: SortOrder) -> list:
+    if order is SortOrder.id:
+        return decode_key(cursor, ID)
+    return decode_key(cursor, OPTIONAL_NUMBER, ID)
+
+
+def unindexed(column):
+    """`column` behind a unary +, which stops SQLite from using it to pick an index."""
+    return UnaryExpression(column, operator=operators.custom_op("+"), type_=column.type)
+
+
+def keyset_ranges(
+    query: SelectOfScalar, order: SortOrder, after: list | None = None, rated_only: bool = False
+) -> list[SelectOfScalar]:
+    """
+    Split the query into ordered queries that together yield its rows in sort
+    order, skipping everything up to and including `after`. `rated_only` says
+    the query's filters already exclude unrated recipes.
+
+    Each query bounds the sort key from one side only, so SQLite answers it
+    with a seek into the rating indexes rather than sorting every remaining
+    match: recipes tied with the cursor's rating, then lower ratings, then the
+    unrated ones.
+    """
+    if order is SortOrder.id:
+        if after is not None:
+            query = query.where(Recipe.id > after[0])
+        return [query.order_by(Recipe.id)]
+
+    rating, recipe_id = after if after is not None else (None, None)
+    ranges = []
+    if after is None:
+        ranges.append(query.where(Recipe.rating.is_not(None)).order_by(Recipe.rating.desc(), Recipe.id.desc()))
+    elif rating is not None:
+        ranges.append(query.where(Recipe.rating == rating, Recipe.id < recipe_id).order_by(Recipe.id.desc()))
+        ranges.append(query.where(Recipe.rating < rating).order_by(Recipe.rating.desc(), Recipe.id.desc()))
+    if rated_only:
+        # SQLite would walk every rated match again to find none of them unrated
+        return ranges
+    unrated = query.where(Recipe.rating.is_(None))
+    if after is not None and rating is None:
+        # Already inside the trailing block of unrated recipes
+        unrated = unrated.where(Recipe.id < recipe_id)
+    ranges.append(unrated.order_by(Recipe.id.desc()))
+    return ranges
@@ -0,0 +1,226 @@
+"""
+"Cook with what I have": score every recipe against a list of pantry items.
+
+The catalog is held as a sparse recipe x ingredient-line x token matrix in
+NumPy arrays. An ingredient line counts as available when every token of
+some pantry item appears in it ("lentils" covers "250g red split lentils"),
+so one query is a handful of vectorized passes over the whole catalog
+instead of a query per ingredient.
+"""
+from threading import Lock
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+import catalog
+from ingredient_index import tokenize
+
+
+class _Column:
+    """Append-only NumPy array with amortized O(1) growth."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.values
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    def replace(self, values: np.ndarray):
+        self.data = np.array(values, dtype=self.data.dtype)
+        self.size = len(values)
+
+
+class PantryMatch(NamedTuple):
+    recipe_id: int
+    coverage: float  # Fraction of the recipe's ingredient lines already available
+    have: int
+    missing: list[str]  # Ingredient lines still needed, as indexed
+
+
+class PantryMatrix:
+    """
+    Rows are recipes, each owning a contiguous run of ingredient-line entries;
+    every token keeps a posting array of the entries containing it.
+
+    Updates append a new row and retire the old one, so writes never rewrite
+    the arrays; retired rows are compacted away once they make up half the matrix.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._row_of: dict[int, int] = {}
+        self._recipe_ids = _Column(np.int64)
+        self._alive = _Column(np.bool_)
+        self._rating = _Column(np.float32)  # NaN when unrated
+        self._vegetarian = _Column(np.bool_)
+        self._first_entry = _Column(np.int64)
+        self._n_entries = _Column(np.int32)
+        self._n_needed = _Column(np.int32)
+        self._entry_row = _Column(np.int32)
+        # Lines with no meaningful tokens ("1 tsp") never count as missing
+        self._entry_needed = _Column(np.bool_)
+        self._vocabulary: dict[str, int] = {}
+        self._postings: list[_Column] = []
+        # Each row's ingredient lines, so missing lines are named from the same data they were matched on
+        self._lines: list[tuple[str, ...]] = []
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def recipes_saved(self, recipes: Sequence[catalog.CatalogRecord]):
+        with self._lock:
+            for recipe in recipes:
+                self._retire(recipe.id)
+            self._append(recipes)
+            self._maybe_compact()
+
+    def recipes_removed(self, recipe_ids: list[int]):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._retire(recipe_id)
+            self._maybe_compact()
+
+    def match(
+        self,
+        pantry: Sequence[str],
+        vegetarian: bool | None = None,
+        min_rating: float | None = None,
+        limit: int = 20,
+    ) -> list[PantryMatch]:
+        """Top recipes by coverage (then fewest missing lines, then rating)."""
+        items = [tokenize(item) for item in pantry]
+        with self._lock:
+            n_entries = self._entry_row.size
+            items = [
+                [self._vocabulary[token] for token in item]
+                for item in items
+                if item and all(token in self._vocabulary for token in item)
+            ]
+
+            available = np.zeros(n_entries, dtype=np.bool_)
+            for item in items:
+                postings = [self._postings[token].values for token in item]
+                if len(postings) == 1:
+                    available[postings[0]] = True
+                else:
+                    # Lines containing every token of the item
+                    counts = np.bincount(np.concatenate(postings), minlength=n_entries)
+                    available |= counts == len(postings)
+            available &= self._entry_needed.values
+
+            n_rows = self._recipe_ids.size
+            have = np.bincount(self._entry_row.values, weights=available, minlength=n_rows)
+            needed = self._n_needed.values
+            coverage = np.divide(have, needed, out=np.zeros(n_rows), where=needed > 0)
+
+            candidates = self._alive.values & (have > 0)
+            if vegetarian is not None:
+                candidates &= self._vegetarian.values == vegetarian
+            if min_rating is not None:
+                candidates &= self._rating.values >= min_rating  # NaN never passes
+            rows = np.flatnonzero(candidates)
+
+            missing = needed[rows] - have[rows]
+            rating = np.nan_to_num(self._rating.values[rows], nan=-1.0)
+            # lexsort sorts by the last key first
+            rows = rows[np.lexsort((-rating, missing, -coverage[rows]))][:limit]
+
+            matches = []
+            for row in rows:
+                start = self._first_entry.data[row]
+                lines = slice(start, start + self._n_entries.data[row])
+                still_needed = self._entry_needed.data[lines] & ~available[lines]
+                names = self._lines[row]
+                matches.append(PantryMatch(
+                    recipe_id=int(self._recipe_ids.data[row]),
+                    coverage=float(coverage[row]),
+                    have=int(have[row]),
+                    missing=[names[position] for position in np.flatnonzero(still_needed)],
+                ))
+            return matches
+
+    def _append(self, recipes: Sequence[catalog.CatalogRecord]):
+        # Later duplicates in a batch win, as with separate saves
+        recipes = list({recipe.id: recipe for recipe in recipes}.values())
+        first_row, first_entry = self._recipe_ids.size, self._entry_row.size
+        entry_tokens, entry_row, entry_needed, n_entries, n_needed = [], [], [], [], []
+        entry = first_entry
+        for row, recipe in enumerate(recipes, start=first_row):
+            self._row_of[recipe.id] = row
+            n_entries.append(len(recipe.ingredients))
+            needed = 0
+            for line in recipe.ingredients:
+                tokens = tokenize(line)
+                needed += bool(tokens)
+                entry_needed.append(bool(tokens))
+                entry_row.append(row)
+                for token in tokens:
+                    token_id = self._vocabulary.get(token)
+                    if token_id is None:
+                        token_id = self._vocabulary[token] = len(self._postings)
+                        self._postings.append(_Column(np.int64, capacity=16))
+                    entry_tokens.append((token_id, entry))
+                entry += 1
+            n_needed.append(needed)
+
+        self._recipe_ids.extend([recipe.id for recipe in recipes])
+        self._lines.extend(tuple(recipe.ingredients) for recipe in recipes)
+        self._alive.extend(np.ones(len(recipes), dtype=np.bool_))
+        self._rating.extend([np.nan if recipe.rating is None else recipe.rating for recipe in recipes])
+        self._vegetarian.extend([recipe.vegetarian for recipe in recipes])
+        self._first_entry.extend(first_entry + np.cumsum(n_entries) - n_entries)
+        self._n_entries.extend(n_entries)
+        self._n_needed.extend(n_needed)
+        self._entry_row.extend(entry_row)
+        self._entry_needed.extend(entry_needed)
+
+        # One extend per token for the whole batch
+        if entry_tokens:
+            pairs = np.array(entry_tokens, dtype=np.int64)
+            pairs = pairs[np.argsort(pairs[:, 0], kind="stable")]
+            tokens, starts = np.unique(pairs[:, 0], return_index=True)
+            for token_id, entries in zip(tokens, np.split(pairs[:, 1], starts[1:])):
+                self._postings[token_id].extend(entries)
+
+    def _retire(self, recipe_id: int):
+        row = self._row_of.pop(recipe_id, None)
+        if row is not None:
+            self._alive.data[row] = False
+
+    def _maybe_compact(self):
+        n_rows = self._recipe_ids.size
+        if n_rows < 1024 or len(self._row_of) * 2 > n_rows:
+            return
+
+        alive = self._alive.values
+        entry_alive = alive[self._entry_row.values]
+        new_row = np.cumsum(alive) - 1
+        new_entry = np.cumsum(entry_alive) - 1
+
+        for posting in self._postings:
+            kept = posting.values[entry_alive[posting.values]]
+            posting.replace(new_entry[kept])
+        self._entry_row.replace(new_row[self._entry_row.values[entry_alive]])
+        self._entry_needed.replace(self._entry_needed.values[entry_alive])
+        # Surviving rows keep their entries contiguous and in row order
+        n_entries = self._n_entries.values[alive]
+        self._first_entry.replace(np.cumsum(n_entries) - n_entries)
+        for column in (self._recipe_ids, self._rating, self._vegetarian, self._n_entries, self._n_needed, self._alive):
+            column.replace(column.values[alive])
+        self._lines = [lines for lines, kept in zip(self._lines, alive) if kept]
+        self._row_of = {int(recipe_id): row for row, recipe_id in enumerate(self._recipe_ids.values)}
+
+
+pantry_matrix = catalog.subscribe(PantryMatrix())
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable
+
+import catalog
+import settings
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of serialized query results, with a time-to-live.
+
+    Every catalog write bumps `generation` and empties the cache. Results
+    computed under an older generation are not stored, so a query that raced
+    with a write cannot put stale data back.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = self.misses = self.evictions = 0
+        self._size = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, object]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value: object, size: int, generation: int):
+        """Store a result of `size` bytes computed while the cache was at `generation`."""
+        if size > self.max_bytes or self.max_entries == 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def recipes_saved(self, recipes):
+        self.invalidate()
+
+    def recipes_removed(self, recipe_ids):
+        self.invalidate()
+
+    def _drop(self, key: Hashable):
+        self._size -= self._entries.pop(key)[1]
+
+
+query_cache = catalog.subscribe(
+    QueryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES, settings.CACHE_TTL_SECONDS)
+)
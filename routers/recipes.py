@@ -1,135 +1,619 @@
-from fastapi import Depends, HTTPException, APIRouter, Query
+import io
+import tempfile
+from bisect import bisect_right
+from typing import Any, AsyncIterator, Collection, Literal
+
+from fastapi import Body, Depends, HTTPException, APIRouter, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from db import get_session 
-from schemas import Recipe, RecipeOutput, RecipeInput
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import catalog
+import fulltext
+from db import async_engine, get_async_session
+from facets import facet_index
+from importer import DEFAULT_BATCH_SIZE, existing_ids, import_stream
+from ingredient_index import ingredient_index, parse_terms
+from pagination import (
+    ID, MAX_PAGE_SIZE, NUMBER, STREAM_BATCH_SIZE, PageParams, SortOrder, decode_cursor, decode_key, encode_cursor, encode_key,
+    keyset_ranges, unindexed
+)
+from pantry import pantry_matrix
+from query_cache import query_cache
+from schemas import (
+    BatchItemResult, Facets, ImportReport, PantryQuery, PantryResult, Recipe, RecipeIngredient, RecipeOutput, RecipeInput,
+    RecipeUpdate, SimilarRecipe
+)
+from serialization import make_etag, recipe_json, recipe_output
+from similar import similarity_index
+from snapshot import snapshot_server
 
 router = APIRouter(prefix="/recipes")
 
-#get all recipes
-@router.get("/", response_model=list[RecipeOutput])
-def get_recipes(session: Session = Depends(get_session)):
-    recipes = session.exec(select(Recipe)).all()
-    return [
-        RecipeOutput(
-            id=recipe.id,
-            title=recipe.title,
-            ingredients=recipe.ingredients_list,
-            method=recipe.method,
-            rating=recipe.rating,
-            img=recipe.img,
-            vegetarian=recipe.vegetarian
+# Keep IN (...) lists well below SQLite's bound-variable limit
+ID_CHUNK_SIZE = 500
+# Items per /batch request
+MAX_BATCH_SIZE = 5000
+# Import bodies larger than this are spooled to a temporary file
+IMPORT_SPOOL_SIZE = 16 * 1024 * 1024
+
+DUPLICATE_KEY = "A recipe with this title and img already exists"
+
+# Parses cached result bytes for the HTML routes
+RESULTS_ADAPTER = TypeAdapter(list[RecipeOutput])
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as If-None-Match calls for
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def json_response(request: Request, body: bytes, etag: str, headers: dict | None = None) -> Response:
+    """Send pre-encoded JSON with its ETag, or an empty 304 when the client already has it."""
+    headers = {**(headers or {}), "ETag": etag}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def iter_recipes(
+    session: AsyncSession,
+    *filters,
+    ids: set[int] | None = None,
+    order: SortOrder = SortOrder.id,
+    after: list | None = None,
+    limit: int | None = None,
+    rated_only: bool = False,
+) -> AsyncIterator[Recipe]:
+    """
+    Yield the recipes passing `filters` in sort order, resuming after the `after` key.
+
+    Rows are pulled from the database cursor in batches, so memory use does not
+    grow with the size of the result. `ids` restricts the search to a set of
+    recipe ids (an ingredient index match), which are put in order in memory
+    and loaded a chunk at a time. `rated_only` says the filters exclude unrated recipes.
+    """
+    if ids is None:
+        for query in keyset_ranges(select(Recipe).where(*filters), order, after, rated_only):
+            if limit is not None:
+                if limit == 0:
+                    return
+                query = query.limit(limit)
+            result = await session.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for recipe in result:
+                yield recipe
+                if limit is not None:
+                    limit -= 1
+        return
+
+    if order is SortOrder.id:
+        ordered = sorted(ids)
+        if after is not None:
+            ordered = ordered[bisect_right(ordered, after[0]):]
+    else:
+        ordered = facet_index.order_by_rating(ids, after)
+    start = 0
+    while start < len(ordered) and limit != 0:
+        # Small limits only load what they can use; filtered-out rows cost another round trip
+        chunk = ordered[start:start + min(ID_CHUNK_SIZE, limit or ID_CHUNK_SIZE)]
+        start += len(chunk)
+        recipes = {recipe.id: recipe for recipe in await session.exec(select(Recipe).where(Recipe.id.in_(chunk), *filters))}
+        for recipe_id in chunk:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            yield recipe
+            if limit is not None:
+                limit -= 1
+                if limit == 0:
+                    return
+
+
+def search_criteria(
+    ingredients: str | None = None,
+    rating: float | None = None,
+    vegetarian: bool | None = None,
+    match: str = "all",
+    order: SortOrder = SortOrder.id,
+) -> tuple[list, set[int] | None]:
+    """Translate search parameters into SQL filters plus an optional set of candidate ids."""
+    # Add filters dynamically only if parameters are provided
+    filters = []
+    if rating is not None:
+        filters.append(Recipe.rating >= rating)
+    if vegetarian is not None:
+        # ix_recipe_vegetarian_rating serves rating order; in id order SQLite would seek it
+        # and then sort every match, where a scan of the rowid is already in order
+        column = Recipe.vegetarian if order is SortOrder.rating else unindexed(Recipe.vegetarian)
+        filters.append(column == vegetarian)
+    ids = ingredient_index.lookup(ingredients, match_all=match == "all") if ingredients else None
+    return filters, ids
+
+
+def search_key(
+    ingredients: str | None = None,
+    rating: float | None = None,
+    vegetarian: bool | None = None,
+    match: str = "all",
+) -> tuple:
+    """Normalize search parameters so equivalent spellings share a cache entry."""
+    terms = None
+    if ingredients:
+        terms = tuple(sorted(" ".join(sorted(term)) for term in parse_terms(ingredients)))
+        if len(terms) < 2:
+            match = "all"
+    return terms, rating, vegetarian, match
+
+
+async def _fetch_page(
+    session: AsyncSession, filters: list, ids: set[int] | None, order: SortOrder, after: list | None, limit: int | None,
+    rated_only: bool,
+) -> tuple[list[Recipe], str | None]:
+    # Fetch one extra row to find out whether there is a next page
+    fetch = None if limit is None else limit + 1
+    recipes = [
+        recipe async for recipe in iter_recipes(
+            session, *filters, ids=ids, order=order, after=after, limit=fetch, rated_only=rated_only
         )
-        for recipe in recipes
     ]
+    if limit is not None and len(recipes) > limit:
+        recipes = recipes[:limit]
+        return recipes, encode_cursor(recipes[-1], order)
+    return recipes, None
+
+
+async def cached_search(
+    session: AsyncSession, query: dict, order: SortOrder = SortOrder.id, cursor: str | None = None, limit: int | None = None
+) -> tuple[bytes, str | None, str]:
+    """
+    Return one serialized page of search results, the next cursor and the
+    page's ETag, from the query cache when possible.
+    """
+    key = (search_key(**query), order, cursor, limit)
+    generation, json_generation = query_cache.generation, recipe_json.generation
+    cached = query_cache.get(key)
+    if cached is not None:
+        return cached
+
+    after = decode_cursor(cursor, order) if cursor else None
+    filters, ids = search_criteria(**query, order=order)
+    snapshot = snapshot_server.serving()
+    if snapshot is not None:
+        positions = snapshot.select(query.get("rating"), query.get("vegetarian"), ids, order, after)
+        body, next_cursor = snapshot.page(positions, order, limit)
+    else:
+        rated_only = query.get("rating") is not None
+        recipes, next_cursor = await _fetch_page(session, filters, ids, order, after, limit, rated_only)
+        body = recipe_json.encode_list(recipes, json_generation)
+    result = (body, next_cursor, make_etag(body))
+    query_cache.put(key, result, len(body), generation)
+    return result
+
+
+async def find_recipes(
+    session: AsyncSession,
+    ingredients: str | None = None,
+    rating: float | None = None,
+    vegetarian: bool | None = None,
+) -> list[RecipeOutput]:
+    """Unpaginated combined search, for callers outside the JSON API."""
+    query = {"ingredients": ingredients, "rating": rating, "vegetarian": vegetarian}
+    body, _, _ = await cached_search(session, query)
+    return RESULTS_ADAPTER.validate_json(body)
+
+
+async def _ndjson_lines(
+    filters: list, ids: set[int] | None, order: SortOrder, after: list | None, limit: int | None, rated_only: bool
+):
+    generation = recipe_json.generation
+    # The request's session may be closed before the body is sent, so use our own
+    async with AsyncSession(async_engine) as session:
+        async for recipe in iter_recipes(
+            session, *filters, ids=ids, order=order, after=after, limit=limit, rated_only=rated_only
+        ):
+            yield recipe_json.encode(recipe, generation)[0] + b"\n"
+
+
+async def search_page(
+    request: Request, session: AsyncSession, page: PageParams, query: dict, order: SortOrder = SortOrder.id
+) -> Response:
+    """
+    Build a list response: one page of JSON with an ETag, plus an X-Next-Cursor
+    header when more rows remain, or an uncached NDJSON stream when `stream` is set.
+    """
+    if page.stream:
+        after = decode_cursor(page.cursor, order) if page.cursor else None
+        filters, ids = search_criteria(**query, order=order)
+        snapshot = snapshot_server.serving()
+        if snapshot is not None:
+            positions = snapshot.select(query.get("rating"), query.get("vegetarian"), ids, order, after)
+            return StreamingResponse(
+                snapshot.iter_ndjson(positions[:page.limit]), media_type="application/x-ndjson"
+            )
+        return StreamingResponse(
+            _ndjson_lines(filters, ids, order, after, page.limit, query.get("rating") is not None),
+            media_type="application/x-ndjson",
+        )
+
+    body, next_cursor, etag = await cached_search(session, query, order, page.cursor, page.limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(request, body, etag, headers)
+
+
+#get all recipes
+@router.get("/", response_model=list[RecipeOutput])
+async def get_recipes(request: Request, page: PageParams = Depends(), session: AsyncSession = Depends(get_async_session)):
+    return await search_page(request, session, page, {})
 
 
 #search recipes by ingredients
 @router.get("/ingresearch", response_model=list[RecipeOutput])
-def search_recipes_by_ingredients(keyword: str, session: Session = Depends(get_session)):
-    query = select(Recipe).where(Recipe.ingredients.contains(keyword))
-    recipes = session.exec(query).all()
-    return [
-        RecipeOutput(
-            id=recipe.id,
-            title=recipe.title,
-            ingredients=recipe.ingredients_list,  # Convert to list
-            method=recipe.method,
-            rating=recipe.rating,
-            img=recipe.img,
-            vegetarian=recipe.vegetarian
-        )
-        for recipe in recipes
-    ]
+async def search_recipes_by_ingredients(
+    request: Request,
+    keyword: str,
+    match: Literal["all", "any"] = "all",
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session)
+):
+    # Comma-separated keywords are matched as whole words via the inverted index
+    return await search_page(request, session, page, {"ingredients": keyword, "match": match})
 
 # Search recipes by rating
 @router.get("/ratesearch", response_model=list[RecipeOutput])
-def search_recipes_by_rating(rating: float, session: Session = Depends(get_session)):
-    query = select(Recipe).where(Recipe.rating >= rating)
-    recipes = session.exec(query).all()
-    return [
-        RecipeOutput(
-            id=recipe.id,
-            title=recipe.title,
-            ingredients=recipe.ingredients_list,  # Convert to list
-            method=recipe.method,
-            rating=recipe.rating,
-            img=recipe.img,
-            vegetarian=recipe.vegetarian
-        )
-        for recipe in recipes
-    ]
+async def search_recipes_by_rating(
+    request: Request, rating: float, page: PageParams = Depends(), session: AsyncSession = Depends(get_async_session)
+):
+    # Best rated first, paginated on (rating, id)
+    return await search_page(request, session, page, {"rating": rating}, order=SortOrder.rating)
 
 # Search recipes by vegetarian status
 @router.get("/vegsearch", response_model=list[RecipeOutput])
-def search_recipes_by_vegetarian(vegetarian: bool, session: Session = Depends(get_session)):
-    query = select(Recipe).where(Recipe.vegetarian == vegetarian)
-    recipes = session.exec(query).all()
-    return [
-        RecipeOutput(
-            id=recipe.id,
-            title=recipe.title,
-            ingredients=recipe.ingredients_list,  # Convert to list
-            method=recipe.method,
-            rating=recipe.rating,
-            img=recipe.img,
-            vegetarian=recipe.vegetarian
-        )
-        for recipe in recipes
-    ]
+async def search_recipes_by_vegetarian(
+    request: Request, vegetarian: bool, page: PageParams = Depends(), session: AsyncSession = Depends(get_async_session)
+):
+    return await search_page(request, session, page, {"vegetarian": vegetarian})
 
 #combined search
 @router.get("/search", response_model=list[RecipeOutput])
-def search_recipes(
+async def search_recipes(
+    request: Request,
     ingredients: str | None = Query(None),
     rating: float | None = Query(None),
     vegetarian: bool | None = Query(None),
-    session: Session = Depends(get_session)
+    match: Literal["all", "any"] = "all",
+    sort: SortOrder = SortOrder.id,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    query = select(Recipe)
+    # sort=rating&limit=k is the top k, read in order from the (vegetarian, rating) index
+    query = {"ingredients": ingredients, "rating": rating, "vegetarian": vegetarian, "match": match}
+    return await search_page(request, session, page, query, order=sort)
 
-    # Add filters dynamically only if parameters are provided
-    if ingredients:
-        query = query.where(Recipe.ingredients.contains(ingredients))
-    if rating is not None:
-        query = query.where(Recipe.rating >= rating)
-    if vegetarian is not None:
-        query = query.where(Recipe.vegetarian == vegetarian)
+# Counts by vegetarian flag, rating bucket and ingredient for a search, from in-memory totals
+@router.get("/facets", response_model=Facets)
+async def get_facets(
+    request: Request,
+    ingredients: str | None = Query(None),
+    rating: float | None = Query(None),
+    vegetarian: bool | None = Query(None),
+    match: Literal["all", "any"] = "all",
+    top: int = Query(10, ge=0, le=100, description="How many of the most common ingredients to list"),
+):
+    query = {"ingredients": ingredients, "rating": rating, "vegetarian": vegetarian, "match": match}
+    key = ("facets", search_key(**query), top)
+    generation = query_cache.generation
+    cached = query_cache.get(key)
+    if cached is None:
+        _, ids = search_criteria(**query)
+        body = Facets.model_validate(facet_index.facets(ids, rating, vegetarian, top)).model_dump_json().encode()
+        cached = (body, make_etag(body))
+        query_cache.put(key, cached, len(body), generation)
+    return json_response(request, *cached)
+
+# Full-text search over titles, methods and ingredients, best match first
+@router.get("/fulltext", response_model=list[RecipeOutput])
+async def search_fulltext(
+    request: Request,
+    q: str = Query(..., min_length=1, description='Words, "exact phrases" and prefix* terms'),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    after = decode_key(cursor, NUMBER, ID) if cursor else None
+    generation = recipe_json.generation
+    try:
+        ranked = await fulltext.search(session, q, after, limit + 1)
+    except fulltext.QuerySyntaxError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid full-text query: {exc}")
+    headers = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        last_id, last_score = ranked[-1]
+        headers = {"X-Next-Cursor": encode_key([last_score, last_id])}
+
+    ids = [recipe_id for recipe_id, _ in ranked]
+    recipes = {recipe.id: recipe for recipe in await session.exec(select(Recipe).where(Recipe.id.in_(ids)))}
+    body = recipe_json.encode_list((recipes[recipe_id] for recipe_id in ids if recipe_id in recipes), generation)
+    return json_response(request, body, make_etag(body), headers)
+
+# Rank recipes by how much of them can be cooked from the given ingredients
+@router.post("/pantry", response_model=list[PantryResult])
+async def match_pantry(pantry: PantryQuery, session: AsyncSession = Depends(get_async_session)):
+    matches = pantry_matrix.match(pantry.ingredients, pantry.vegetarian, pantry.min_rating, pantry.limit)
+    ids = [match.recipe_id for match in matches]
+    recipes = {recipe.id: recipe for recipe in await session.exec(select(Recipe).where(Recipe.id.in_(ids)))}
+
+    results = []
+    for match in matches:
+        recipe = recipes.get(match.recipe_id)
+        if recipe is None:
+            continue
+        results.append(PantryResult(
+            recipe=recipe_output(recipe),
+            coverage=round(match.coverage, 4),
+            missing=len(match.missing),
+            missing_ingredients=match.missing,
+        ))
+    return results
+
+# Query cache counters
+@router.get("/cache")
+async def get_cache_stats():
+    return query_cache.stats()
+
+async def _load_recipes(session: AsyncSession, ids: list[int]) -> dict[int, Recipe]:
+    """Fetch recipes by id with one IN query per chunk."""
+    recipes = {}
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        for recipe in await session.exec(select(Recipe).where(Recipe.id.in_(chunk))):
+            recipes[recipe.id] = recipe
+    return recipes
 
-    recipes = session.exec(query).all()
+
+def _validation_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'body'}: {error['msg']}" for error in exc.errors())
+
+
+# Fetch many recipes at once; results follow the order of `ids`
+@router.post("/batch/get", response_model=list[BatchItemResult])
+async def get_recipes_batch(
+    ids: list[int] = Body(..., embed=True, max_length=MAX_BATCH_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    generation = recipe_json.generation
+    cached = {recipe_id: recipe_json.get(recipe_id) for recipe_id in set(ids)}
+    missing = [recipe_id for recipe_id, entry in cached.items() if entry is None]
+    for recipe in (await _load_recipes(session, missing)).values():
+        cached[recipe.id] = recipe_json.encode(recipe, generation)
+
+    # Assembled from the cached recipe JSON, in BatchItemResult's field order
+    items = [
+        b'{"id":%d,"status":200,"recipe":%b,"error":null}' % (recipe_id, cached[recipe_id][0])
+        if cached[recipe_id] is not None
+        else b'{"id":%d,"status":404,"recipe":null,"error":"Recipe not found"}' % recipe_id
+        for recipe_id in ids
+    ]
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
+
+def _record_writes(session: Session, recipe_ids: Collection[int]) -> int:
+    fulltext.refresh(session, recipe_ids)
+    return catalog.record_changes(session, recipe_ids)
+
+
+async def _commit_writes(session: AsyncSession, recipe_ids: Collection[int]):
+    """
+    Commit the session's writes to `recipe_ids`, with their full-text documents
+    and a change log entry for other processes. Notifying this process's
+    listeners is left to the caller.
+    """
+    if not recipe_ids:
+        await session.commit()
+        return
+    version = await session.run_sync(_record_writes, recipe_ids)
+    await session.commit()
+    catalog.version_announced(version)
+
+
+async def _flush_unique(session: AsyncSession):
+    """Flush, answering 409 when the write would reuse another recipe's (title, img)."""
+    try:
+        await session.flush()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail=DUPLICATE_KEY)
+
+
+def _ingredient_rows(recipe_id: int, ingredients: list[str]) -> list[dict]:
     return [
-        RecipeOutput(
-            id=recipe.id,
-            title=recipe.title,
-            ingredients=recipe.ingredients_list,
-            method=recipe.method,
-            rating=recipe.rating,
-            img=recipe.img,
-            vegetarian=recipe.vegetarian
+        {"recipe_id": recipe_id, "position": position, "name": name}
+        for position, name in enumerate(ingredients)
+    ]
+
+
+def _validate_batch(items: list[Any], model: type[RecipeInput]) -> list[RecipeInput | BatchItemResult]:
+    """Validate each item on its own, so one bad item only fails itself."""
+    validated = []
+    for item in items:
+        try:
+            validated.append(model.model_validate(item))
+        except ValidationError as exc:
+            item_id = item.get("id") if isinstance(item, dict) else None
+            validated.append(BatchItemResult(
+                id=item_id if isinstance(item_id, int) else None, status=422, error=_validation_error(exc)
+            ))
+    return validated
+
+
+# Create many recipes in one transaction; invalid items are reported and skipped
+@router.post("/batch/create", response_model=list[BatchItemResult])
+async def create_recipes_batch(
+    items: list[Any] = Body(..., max_length=MAX_BATCH_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    validated = _validate_batch(items, RecipeInput)
+    new = [item for item in validated if isinstance(item, RecipeInput)]
+    outputs = {}
+    if new:
+        rows = [item.model_dump(exclude={"ingredients"}) for item in new]
+        # One multi-row INSERT ... RETURNING rather than one INSERT per object; a key
+        # already taken, before or earlier in the batch, is skipped and reported.
+        # render_nulls keeps rows with and without a rating in the same statement.
+        statement = (
+            sqlite_insert(Recipe).on_conflict_do_nothing(index_elements=["title", "img"])
+            .returning(Recipe.id, Recipe.title, Recipe.img).execution_options(render_nulls=True)
         )
-        for recipe in recipes
+        created = {(title, img): recipe_id for recipe_id, title, img in await session.exec(statement, params=rows)}
+        for item in new:
+            recipe_id = created.pop((item.title, item.img), None)
+            if recipe_id is not None:
+                outputs[id(item)] = RecipeOutput(id=recipe_id, **item.model_dump())
+        ingredient_rows = [
+            row for item in new if id(item) in outputs for row in _ingredient_rows(outputs[id(item)].id, item.ingredients)
+        ]
+        if ingredient_rows:
+            await session.exec(insert(RecipeIngredient), params=ingredient_rows)
+        await _commit_writes(session, [output.id for output in outputs.values()])
+        catalog.recipes_saved(list(outputs.values()))
+
+    return [
+        item if isinstance(item, BatchItemResult)
+        else BatchItemResult(id=outputs[id(item)].id, status=200, recipe=outputs[id(item)]) if id(item) in outputs
+        else BatchItemResult(id=None, status=409, error=DUPLICATE_KEY)
+        for item in validated
     ]
 
+# Update many recipes in one transaction; unknown ids and invalid items are reported and skipped
+@router.post("/batch/update", response_model=list[BatchItemResult])
+async def update_recipes_batch(
+    items: list[Any] = Body(..., max_length=MAX_BATCH_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    validated = _validate_batch(items, RecipeUpdate)
+    # Later items for the same id win, as with separate requests
+    latest = {item.id: item for item in validated if isinstance(item, RecipeUpdate)}
+    found = set()
+    ids = list(latest)
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        found.update(await session.exec(select(Recipe.id).where(Recipe.id.in_(chunk))))
+
+    # A key held by another recipe, or claimed by an earlier item, conflicts
+    holders = await session.run_sync(existing_ids, list({(item.title, item.img) for item in latest.values()}))
+    conflicts = set()
+    for recipe_id in filter(found.__contains__, latest):
+        key = (latest[recipe_id].title, latest[recipe_id].img)
+        if holders.setdefault(key, recipe_id) != recipe_id:
+            conflicts.add(recipe_id)
+    found -= conflicts
+
+    outputs = {}
+    if found:
+        updates = [latest[recipe_id] for recipe_id in found]
+        try:
+            await session.exec(update(Recipe), params=[item.model_dump(exclude={"ingredients"}) for item in updates])
+        except IntegrityError:
+            # Another writer took one of the keys since the check
+            await session.rollback()
+            raise HTTPException(status_code=409, detail=DUPLICATE_KEY)
+        for start in range(0, len(updates), ID_CHUNK_SIZE):
+            chunk = [item.id for item in updates[start:start + ID_CHUNK_SIZE]]
+            await session.exec(delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(chunk)))
+        ingredient_rows = [row for item in updates for row in _ingredient_rows(item.id, item.ingredients)]
+        if ingredient_rows:
+            await session.exec(insert(RecipeIngredient), params=ingredient_rows)
+        await _commit_writes(session, found)
+        outputs = {item.id: RecipeOutput(**item.model_dump()) for item in updates}
+        catalog.recipes_saved(list(outputs.values()))
+
+    results = []
+    for item in validated:
+        if isinstance(item, BatchItemResult):
+            results.append(item)
+        elif item.id in outputs:
+            results.append(BatchItemResult(id=item.id, status=200, recipe=outputs[item.id]))
+        elif item.id in conflicts:
+            results.append(BatchItemResult(id=item.id, status=409, error=DUPLICATE_KEY))
+        else:
+            results.append(BatchItemResult(id=item.id, status=404, error="Recipe not found"))
+    return results
+
+# Delete many recipes in one transaction
+@router.post("/batch/delete", response_model=list[BatchItemResult])
+async def remove_recipes_batch(
+    ids: list[int] = Body(..., embed=True, max_length=MAX_BATCH_SIZE),
+    session: AsyncSession = Depends(get_async_session)
+):
+    unique_ids = list(dict.fromkeys(ids))
+    deleted = set()
+    for start in range(0, len(unique_ids), ID_CHUNK_SIZE):
+        chunk = unique_ids[start:start + ID_CHUNK_SIZE]
+        # Foreign keys are not enforced on SQLite, so clear the ingredient rows explicitly
+        await session.exec(delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(chunk)))
+        result = await session.exec(delete(Recipe).where(Recipe.id.in_(chunk)).returning(Recipe.id))
+        deleted.update(result.scalars())
+    if deleted:
+        await _commit_writes(session, deleted)
+        catalog.recipes_removed(list(deleted))
+
+    # A repeated id is only deleted once; later occurrences report 404 as a second request would
+    results = []
+    for recipe_id in ids:
+        if recipe_id in deleted:
+            deleted.discard(recipe_id)
+            results.append(BatchItemResult(id=recipe_id, status=204))
+        else:
+            results.append(BatchItemResult(id=recipe_id, status=404, error=f"No recipe with id={recipe_id}."))
+    return results
+
 # Get a recipe by ID
 @router.get("/{recipe_id}", response_model=RecipeOutput)
-def get_recipe_by_id(recipe_id: int, session: Session = Depends(get_session)):
-    recipe = session.get(Recipe, recipe_id)
-    if not recipe:
+async def get_recipe_by_id(recipe_id: int, request: Request, session: AsyncSession = Depends(get_async_session)):
+    # Cached JSON is dropped whenever the recipe changes, so a hit needs no query
+    cached = recipe_json.get(recipe_id)
+    snapshot = snapshot_server.serving(recipe_id)
+    if cached is None and snapshot is not None:
+        # Recipes created since the snapshot was built fall through to the database
+        body = snapshot.get(recipe_id)
+        if body is not None:
+            cached = (body, make_etag(body))
+    if cached is None:
+        generation = recipe_json.generation
+        recipe = await session.get(Recipe, recipe_id)
+        if not recipe:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        cached = recipe_json.encode(recipe, generation)
+
+    return json_response(request, *cached)
+
+# Recipes with the most similar ingredients, from the MinHash/LSH index
+@router.get("/{recipe_id}/similar", response_model=list[SimilarRecipe])
+async def get_similar_recipes(
+    recipe_id: int, limit: int = Query(10, ge=1, le=100), session: AsyncSession = Depends(get_async_session)
+):
+    # Recipes without ingredients are not indexed, so only ask the database when unknown
+    if recipe_id not in similarity_index and not await session.get(Recipe, recipe_id):
         raise HTTPException(status_code=404, detail="Recipe not found")
-    
-    # Convert `ingredients` to a list using the property
-    return RecipeOutput(
-        id=recipe.id,
-        title=recipe.title,
-        ingredients=recipe.ingredients_list,  # Convert to list
-        method=recipe.method,
-        rating=recipe.rating,
-        img=recipe.img,
-        vegetarian=recipe.vegetarian
-    )
+
+    neighbours = similarity_index.similar(recipe_id, limit)
+    recipes = await _load_recipes(session, [neighbour_id for neighbour_id, _ in neighbours])
+    return [
+        SimilarRecipe(recipe=recipe_output(recipes[neighbour_id]), similarity=round(similarity, 4))
+        for neighbour_id, similarity in neighbours
+        if neighbour_id in recipes
+    ]
 
 # Add a new recipe
 @router.post("/", response_model=RecipeOutput)
-def create_recipe(recipe_input: RecipeInput, session: Session = Depends(get_session)):
+async def create_recipe(recipe_input: RecipeInput, session: AsyncSession = Depends(get_async_session)):
     new_recipe = Recipe(
         title=recipe_input.title,
         method=recipe_input.method,
@@ -137,60 +621,67 @@ def create_recipe(recipe_input: RecipeInput, session: Session = Depends(get_sess
         img=recipe_input.img,
         vegetarian=recipe_input.vegetarian,
     )
-    # Use the setter to populate the `ingredients` field
+    # Use the setter to build the ingredient rows
     new_recipe.ingredients_list = recipe_input.ingredients
 
     session.add(new_recipe)
-    session.commit()
-    session.refresh(new_recipe)
-    return RecipeOutput(
-        id=new_recipe.id,
-        title=new_recipe.title,
-        ingredients=new_recipe.ingredients_list,
-        method=new_recipe.method,
-        rating=new_recipe.rating,
-        img=new_recipe.img,
-        vegetarian=new_recipe.vegetarian
-    )
+    await _flush_unique(session)
+    # The session does not expire objects on commit, so no refresh
+    await _commit_writes(session, [new_recipe.id])
+    output = recipe_output(new_recipe)
+    catalog.recipes_saved([output])
+    return output
+
+# Bulk import a JSON array or JSON Lines body
+@router.post("/import", response_model=ImportReport)
+async def import_recipes(
+    request: Request, batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50_000)
+):
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8")
+        report = await run_in_threadpool(import_stream, text, batch_size)
+    if report.stopped:
+        # The batches before the malformed record are committed; say how far it got
+        return Response(report.model_dump_json(), status_code=400, media_type="application/json")
+    return report
 
 # Update an existing recipe
 @router.put("/{recipe_id}", response_model=RecipeOutput)
-def update_recipe(recipe_id: int, recipe_data: RecipeInput, session: Session = Depends(get_session)):
+async def update_recipe(recipe_id: int, recipe_data: RecipeInput, session: AsyncSession = Depends(get_async_session)):
     # Fetch the existing recipe
-    recipe = session.get(Recipe, recipe_id)
+    recipe = await session.get(Recipe, recipe_id)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
-    # Update fields (convert ingredients list to a string)
+    # Update fields (ingredient rows are replaced wholesale)
     recipe.title = recipe_data.title
     recipe.method = recipe_data.method
     recipe.rating = recipe_data.rating
     recipe.img = recipe_data.img
     recipe.vegetarian = recipe_data.vegetarian
-    recipe.ingredients_list = recipe_data.ingredients  # Use the setter to handle conversion
+    recipe.ingredients_list = recipe_data.ingredients  # Old rows are deleted as orphans
 
     # Commit the changes
     session.add(recipe)
-    session.commit()
-    session.refresh(recipe)
+    await _flush_unique(session)
+    await _commit_writes(session, [recipe_id])
+    output = recipe_output(recipe)
+    catalog.recipes_saved([output])
     
     # Return the updated recipe
-    return RecipeOutput(
-        id=recipe.id,
-        title=recipe.title,
-        ingredients=recipe.ingredients_list,  # Convert back to list for output
-        method=recipe.method,
-        rating=recipe.rating,
-        img=recipe.img,
-        vegetarian=recipe.vegetarian
-    )
+    return output
 
 # Delete a recipe
 @router.delete("/{id}", status_code=204)
-def remove_recipe(id: int, session: Session = Depends(get_session)):
-    recipe = session.get(Recipe, id)
+async def remove_recipe(id: int, session: AsyncSession = Depends(get_async_session)):
+    recipe = await session.get(Recipe, id)
     if recipe:
-        session.delete(recipe)
-        session.commit()
+        await session.delete(recipe)
+        await session.flush()
+        await _commit_writes(session, [id])
+        catalog.recipes_removed([id])
     else:
         raise HTTPException(status_code=404, detail=f"No recipe with id={id}.")
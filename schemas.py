@@ -1,20 +1,24 @@
-from sqlmodel import SQLModel, Field
-from typing import List
+from pydantic import computed_field
+from sqlmodel import SQLModel, Field, Relationship, Index
+from typing import Dict, List
 
 
-class RecipeInput(SQLModel):
+class RecipeBase(SQLModel):
     title: str
-    ingredients: List[str] 
     method: str
     rating: float | None = None
     img: str
     vegetarian: bool
 
+
+class RecipeInput(RecipeBase):
+    ingredients: List[str]
+
     class Config:
         schema_extra = {
             "example": {
                 "title": "Best Chocolate Cake",
-                "ingredients": "flour, sugar, cocoa powder, eggs, milk",
+                "ingredients": ["flour", "sugar", "cocoa powder", "eggs", "milk"],
                 "method": "Mix all ingredients and bake at 180°C for 30 minutes.",
                 "rating": 4.8,
                 "img": "https://example.com/cake.jpg",
@@ -23,19 +27,66 @@ class RecipeInput(SQLModel):
         }
 
 
-class Recipe(RecipeInput, table=True):
+class RecipeUpdate(RecipeInput):
+    """One item of a batch update."""
+    id: int
+
+
+class RecipeIngredient(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    ingredients: str = Field(sa_column_kwargs={"nullable": False})
-    
+    recipe_id: int = Field(foreign_key="recipe.id", index=True, ondelete="CASCADE")
+    position: int
+    name: str  # Ingredient line exactly as entered
+
+    recipe: "Recipe" = Relationship(back_populates="ingredient_rows")
+
+
+class Recipe(RecipeBase, table=True):
+    __table_args__ = (
+        # (title, img) is the natural key bulk imports upsert on
+        Index("ix_recipe_title_img", "title", "img", unique=True),
+        # Rating-ordered searches walk these instead of sorting; SQLite appends the id to every index
+        Index("ix_recipe_vegetarian_rating", "vegetarian", "rating"),
+        Index("ix_recipe_rating", "rating"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+
+    # Loaded with one extra SELECT ... IN per batch of recipes, never per row
+    ingredient_rows: List[RecipeIngredient] = Relationship(
+        back_populates="recipe",
+        sa_relationship_kwargs={
+            "order_by": "RecipeIngredient.position",
+            "cascade": "all, delete-orphan",
+            "lazy": "selectin",
+        },
+    )
+
     @property
     def ingredients_list(self) -> List[str]:
-        """Convert the comma-separated string back to a list."""
-        return self.ingredients.split(", ")
+        """The ingredient lines in their original order."""
+        return [row.name for row in self.ingredient_rows]
 
     @ingredients_list.setter
     def ingredients_list(self, value: List[str]):
-        """Convert a list to a comma-separated string for storage."""
-        self.ingredients = ", ".join(value)
+        """Replace the ingredient rows; removed rows are deleted on flush."""
+        self.ingredient_rows = [
+            RecipeIngredient(position=position, name=name)
+            for position, name in enumerate(value)
+        ]
+
+class CatalogVersion(SQLModel, table=True):
+    """A single row, bumped by every write so that other processes notice it (see catalog.py)."""
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+
+
+class CatalogChange(SQLModel, table=True):
+    """The recipes each catalog version created, updated or deleted."""
+    version: int = Field(primary_key=True)
+    recipe_id: int = Field(primary_key=True)
+    changed_at: float  # time.time() of the write, for pruning
+
 
 class RecipeOutput(SQLModel):
     id: int
@@ -44,4 +95,60 @@ class RecipeOutput(SQLModel):
     method: str
     rating: float | None
     img: str
-    vegetarian: bool
\ No newline at end of file
+    vegetarian: bool
+
+class PantryQuery(SQLModel):
+    ingredients: List[str]  # What the user has, e.g. ["eggs", "red lentils"]
+    vegetarian: bool | None = None
+    min_rating: float | None = None
+    limit: int = Field(default=20, ge=1, le=100)
+
+
+class PantryResult(SQLModel):
+    recipe: RecipeOutput
+    coverage: float  # Fraction of the recipe's ingredients already at hand
+    missing: int
+    missing_ingredients: List[str]
+
+
+class SimilarRecipe(SQLModel):
+    recipe: RecipeOutput
+    similarity: float  # Estimated Jaccard similarity of the ingredient sets
+
+
+class ImportReport(SQLModel):
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[str] = []  # The first few validation failures
+    stopped: str | None = None  # Why the import ended before the end of the input
+    seconds: float = 0.0
+
+    @computed_field
+    @property
+    def processed(self) -> int:
+        return self.inserted + self.updated + self.failed
+
+    @computed_field
+    @property
+    def recipes_per_second(self) -> float:
+        return round(self.processed / self.seconds, 1) if self.seconds else 0.0
+
+
+class BatchItemResult(SQLModel):
+    id: int | None  # None when a new recipe was not created
+    status: int  # What the single-recipe endpoint would have answered
+    recipe: RecipeOutput | None = None
+    error: str | None = None
+
+
+class FacetCount(SQLModel):
+    name: str
+    count: int
+
+
+class Facets(SQLModel):
+    total: int
+    vegetarian: Dict[str, int]  # "true" / "false"
+    rating: Dict[str, int]  # "0-1" ... "4-5" and "unrated"
+    ingredients: List[FacetCount]  # Most common first
@@ -0,0 +1,87 @@
+"""
+Precomputed JSON for recipe responses.
+
+Each recipe's encoded RecipeOutput is cached by id, so list responses are
+assembled by joining cached bytes instead of building and validating a
+model per row. Catalog notifications drop the entries of saved or removed
+recipes.
+"""
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable
+
+import catalog
+import settings
+from schemas import Recipe, RecipeOutput
+
+
+def recipe_output(recipe: Recipe) -> RecipeOutput:
+    return RecipeOutput(
+        id=recipe.id,
+        title=recipe.title,
+        ingredients=recipe.ingredients_list,
+        method=recipe.method,
+        rating=recipe.rating,
+        img=recipe.img,
+        vegetarian=recipe.vegetarian
+    )
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class RecipeJsonCache:
+    """
+    Bounded LRU of encoded recipes and their ETags, keyed by recipe id.
+
+    As in QueryCache, every write bumps `generation`; callers read it before
+    loading rows and an encoding made under an older generation is returned
+    but not stored, so a read that raced with a write cannot cache stale JSON.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: OrderedDict[int, tuple[bytes, str]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, recipe_id: int) -> tuple[bytes, str] | None:
+        """The cached (body, etag) of a recipe, if present."""
+        with self._lock:
+            entry = self._entries.get(recipe_id)
+            if entry is not None:
+                self._entries.move_to_end(recipe_id)
+            return entry
+
+    def encode(self, recipe: Recipe, generation: int) -> tuple[bytes, str]:
+        entry = self.get(recipe.id)
+        if entry is not None:
+            return entry
+        body = recipe_output(recipe).model_dump_json().encode()
+        entry = (body, make_etag(body))
+        with self._lock:
+            if generation == self.generation and self.max_entries > 0:
+                self._entries[recipe.id] = entry
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def encode_list(self, recipes: Iterable[Recipe], generation: int) -> bytes:
+        return b"[" + b",".join(self.encode(recipe, generation)[0] for recipe in recipes) + b"]"
+
+    def recipes_saved(self, recipes):
+        self._drop([recipe.id for recipe in recipes])
+
+    def recipes_removed(self, recipe_ids):
+        self._drop(recipe_ids)
+
+    def _drop(self, recipe_ids):
+        with self._lock:
+            self.generation += 1
+            for recipe_id in recipe_ids:
+                self._entries.pop(recipe_id, None)
+
+
+recipe_json = catalog.subscribe(RecipeJsonCache(settings.JSON_CACHE_MAX_ENTRIES))
@@ -0,0 +1,30 @@
+"""Runtime settings, read once from the environment."""
+import os
+
+# Query result cache (see query_cache.py)
+CACHE_MAX_ENTRIES = int(os.environ.get("RECIPES_CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(os.environ.get("RECIPES_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL_SECONDS = float(os.environ.get("RECIPES_CACHE_TTL_SECONDS", 60))
+
+# Encoded JSON per recipe (see serialization.py)
+JSON_CACHE_MAX_ENTRIES = int(os.environ.get("RECIPES_JSON_CACHE_MAX_ENTRIES", 100_000))
+
+# Database (see db.py)
+DATABASE_PATH = os.environ.get("RECIPES_DATABASE_PATH", "recipes.db")
+SQL_ECHO = os.environ.get("RECIPES_SQL_ECHO", "").lower() in ("1", "true", "yes")
+SQLITE_SYNCHRONOUS = os.environ.get("RECIPES_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("RECIPES_SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("RECIPES_SQLITE_CACHE_SIZE_KB", 64 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("RECIPES_SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+# Instrumentation (see metrics.py); 0 disables the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("RECIPES_SLOW_QUERY_MS", 0))
+
+# How often servers check for writes made by other processes (see catalog.py); 0 disables
+CATALOG_POLL_SECONDS = float(os.environ.get("RECIPES_CATALOG_POLL_SECONDS", 5))
+# How long the log of changed recipe ids is kept; a server further behind reloads everything
+CATALOG_CHANGE_RETENTION_SECONDS = float(os.environ.get("RECIPES_CATALOG_CHANGE_RETENTION_SECONDS", 24 * 3600))
+
+# Read-only snapshot serving (see snapshot.py); empty keeps reads on the database
+SNAPSHOT_PATH = os.environ.get("RECIPES_SNAPSHOT_PATH", "")
+SNAPSHOT_RELOAD_SECONDS = float(os.environ.get("RECIPES_SNAPSHOT_RELOAD_SECONDS", 2))
@@ -0,0 +1,128 @@
+"""
+"More like this": recipes with similar ingredient sets, via MinHash and LSH.
+
+Each recipe's set of normalized ingredient names is summarized by a MinHash
+signature, whose matching slots estimate the Jaccard similarity between two
+sets. Signatures are split into bands and every band is hashed into buckets,
+so a lookup only compares the recipes sharing at least one bucket instead of
+the whole catalog.
+"""
+import hashlib
+from functools import lru_cache
+from itertools import islice
+from threading import Lock
+from typing import Sequence
+
+import numpy as np
+
+import catalog
+from ingredient_index import normalize_ingredient
+
+NUM_PERM = 96
+# 32 bands of 3 rows: pairs above ~30% similarity are likely to share a bucket
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Caps the work per lookup when staples make some buckets huge
+MAX_BUCKET_CANDIDATES = 200
+# Recipes hashed per vectorized pass
+SIGNATURE_BATCH_SIZE = 2000
+
+_rng = np.random.default_rng(20240601)
+# Multiply-shift hashing: ((a * x + b) mod 2**64) >> 32, with odd a
+_A = _rng.integers(0, 2 ** 64, NUM_PERM, dtype=np.uint64, endpoint=False) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 64, NUM_PERM, dtype=np.uint64, endpoint=False)
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_hash(name: str) -> int:
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=4).digest(), "little")
+
+
+def signatures(ingredient_sets: Sequence[Sequence[str]]) -> np.ndarray:
+    """MinHash signatures (one uint32 row per set) of non-empty sets of normalized names."""
+    sizes = np.fromiter((len(names) for names in ingredient_sets), dtype=np.int64, count=len(ingredient_sets))
+    hashes = np.fromiter(
+        (_feature_hash(name) for names in ingredient_sets for name in names), dtype=np.uint64, count=int(sizes.sum())
+    )
+    # uint64 arithmetic wraps, which is the mod 2**64
+    values = (hashes[:, None] * _A + _B) >> np.uint64(32)
+    return np.minimum.reduceat(values, np.cumsum(sizes) - sizes, axis=0).astype(np.uint32)
+
+
+class SimilarityIndex:
+    """MinHash signatures of every recipe with ingredients, bucketed per band."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._signatures: dict[int, np.ndarray] = {}
+        self._buckets: list[dict[bytes, set[int]]] = [{} for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, recipe_id: int) -> bool:
+        return recipe_id in self._signatures
+
+    def recipes_saved(self, recipes: Sequence[catalog.CatalogRecord]):
+        recipes = list({recipe.id: recipe for recipe in recipes}.values())
+        with self._lock:
+            for recipe in recipes:
+                self._remove(recipe.id)
+            named = []
+            for recipe in recipes:
+                names = tuple(dict.fromkeys(filter(None, map(normalize_ingredient, recipe.ingredients))))
+                if names:
+                    named.append((recipe.id, names))
+            for start in range(0, len(named), SIGNATURE_BATCH_SIZE):
+                batch = named[start:start + SIGNATURE_BATCH_SIZE]
+                for (recipe_id, _), signature in zip(batch, signatures([names for _, names in batch])):
+                    self._add(recipe_id, signature)
+
+    def recipes_removed(self, recipe_ids: list[int]):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+
+    def similar(self, recipe_id: int, limit: int = 10) -> list[tuple[int, float]]:
+        """Up to `limit` (recipe id, estimated Jaccard similarity) pairs, most similar first."""
+        with self._lock:
+            signature = self._signatures.get(recipe_id)
+            if signature is None:
+                return []
+            candidates = set()
+            for band, buckets in enumerate(self._buckets):
+                bucket = buckets.get(self._band_key(signature, band), ())
+                candidates.update(islice(bucket, MAX_BUCKET_CANDIDATES))
+            candidates.discard(recipe_id)
+            if not candidates:
+                return []
+            ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            others = np.stack([self._signatures[candidate] for candidate in candidates])
+
+        similarity = (others == signature).mean(axis=1)
+        # Most similar first, then oldest
+        best = np.lexsort((ids, -similarity))[:limit]
+        return [(int(ids[i]), float(similarity[i])) for i in best]
+
+    @staticmethod
+    def _band_key(signature: np.ndarray, band: int) -> bytes:
+        return signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def _add(self, recipe_id: int, signature: np.ndarray):
+        self._signatures[recipe_id] = signature
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(self._band_key(signature, band), set()).add(recipe_id)
+
+    def _remove(self, recipe_id: int):
+        signature = self._signatures.pop(recipe_id, None)
+        if signature is None:
+            return
+        for band, buckets in enumerate(self._buckets):
+            key = self._band_key(signature, band)
+            bucket = buckets[key]
+            bucket.discard(recipe_id)
+            if not bucket:
+                del buckets[key]
+
+
+similarity_index = catalog.subscribe(SimilarityIndex())
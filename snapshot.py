@@ -0,0 +1,412 @@
+"""
+Read-only snapshot serving: the catalog compacted into one memory-mapped file.
+
+When RECIPES_SNAPSHOT_PATH is set, the search and get endpoints answer from a
+columnar snapshot instead of the database: ids, ratings and vegetarian flags
+are NumPy arrays, and every recipe's JSON and ingredient lines live in
+offset-indexed blobs. Each worker maps the file read-only, so workers share
+its pages and no ORM objects are built on the read path.
+
+Writes still go to the database. The worker that made them rebuilds the
+snapshot shortly afterwards, and every worker notices the new file, maps it
+and replays the differences to the catalog listeners, so reads trail writes
+by a few seconds at most.
+
+    python snapshot.py catalog.snapshot
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator, NamedTuple
+
+import numpy as np
+from sqlalchemy import Engine
+
+import catalog
+import settings
+from pagination import STREAM_BATCH_SIZE, SortOrder, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RCPSNAP1"
+# Recipes per notification when replaying a snapshot to the catalog listeners
+REPLAY_BATCH_SIZE = 10_000
+_FOOTER = 16  # Header length (little-endian uint64), then MAGIC
+
+
+class _Column(NamedTuple):
+    offset: int
+    dtype: str
+    length: int
+
+
+def _write_array(fp, array: np.ndarray) -> dict:
+    fp.write(b"\0" * (-fp.tell() % 8))  # Keep every array 8-byte aligned
+    offset = fp.tell()
+    fp.write(np.ascontiguousarray(array).tobytes())
+    return {"offset": offset, "dtype": array.dtype.str, "length": len(array)}
+
+
+def build(engine: Engine, path: str, batch_size: int = 10_000):
+    """Write a snapshot of the whole catalog to `path`, atomically replacing any previous one."""
+    from sqlmodel import Session, select
+    from schemas import Recipe, RecipeIngredient, RecipeOutput
+
+    query = (
+        select(Recipe.id, Recipe.title, Recipe.method, Recipe.rating, Recipe.img, Recipe.vegetarian, RecipeIngredient.name)
+        .outerjoin(RecipeIngredient)
+        .order_by(Recipe.id, RecipeIngredient.position)
+        .execution_options(yield_per=batch_size)
+    )
+    ids, ratings, vegetarian, digests = [], [], [], []
+    json_offsets, ingredient_offsets = [0], [0]
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".snapshot-", delete=False) as fp, \
+            tempfile.TemporaryFile() as ingredients_fp:
+        try:
+            json_start = fp.tell()
+            # Read first, so the data is at least as new as the version it is labelled with
+            version = catalog.stored_version(engine)
+            with Session(engine) as session:
+                for row, rows in groupby(session.exec(query), key=itemgetter(0, 1, 2, 3, 4, 5)):
+                    recipe_id, title, method, rating, img, is_vegetarian = row
+                    names = [name for *_, name in rows if name is not None]
+                    # Fields come straight from the database, so skip validation
+                    body = RecipeOutput.model_construct(
+                        id=recipe_id, title=title, ingredients=names, method=method,
+                        rating=rating, img=img, vegetarian=is_vegetarian,
+                    ).model_dump_json().encode()
+                    fp.write(body)
+                    ingredients_fp.write("\0".join(names).encode())
+                    ids.append(recipe_id)
+                    ratings.append(np.nan if rating is None else rating)
+                    vegetarian.append(is_vegetarian)
+                    # Lets a reload tell changed recipes apart; hash() is salted per process
+                    digests.append(int.from_bytes(hashlib.blake2b(body, digest_size=8).digest(), "little"))
+                    json_offsets.append(fp.tell() - json_start)
+                    ingredient_offsets.append(ingredients_fp.tell())
+            json_length = fp.tell() - json_start
+
+            ingredients_fp.seek(0)
+            ingredients_start = fp.tell()
+            shutil.copyfileobj(ingredients_fp, fp)
+
+            ids = np.array(ids, dtype=np.int64)
+            ratings = np.array(ratings, dtype=np.float64)
+            unrated = np.isnan(ratings)
+            # SortOrder.rating: best first, newest first on ties, unrated last
+            by_rating = np.lexsort((-ids, -np.nan_to_num(ratings), unrated))
+            columns = {
+                "ids": _write_array(fp, ids),
+                "rating": _write_array(fp, ratings),
+                "vegetarian": _write_array(fp, np.array(vegetarian, dtype=np.bool_)),
+                "by_rating": _write_array(fp, by_rating.astype(np.int64)),
+                "digest": _write_array(fp, np.array(digests, dtype=np.uint64)),
+                "json_offsets": _write_array(fp, np.array(json_offsets, dtype=np.int64)),
+                "ingredient_offsets": _write_array(fp, np.array(ingredient_offsets, dtype=np.int64)),
+            }
+            header = json.dumps({
+                "count": len(ids),
+                "version": version,
+                "json": [json_start, json_length],
+                "ingredients": [ingredients_start, ingredient_offsets[-1]],
+                "columns": columns,
+            }).encode()
+            fp.write(header)
+            fp.write(len(header).to_bytes(8, "little") + MAGIC)
+            fp.flush()
+            os.fsync(fp.fileno())
+        except BaseException:
+            os.unlink(fp.name)
+            raise
+    os.replace(fp.name, path)
+
+
+class Snapshot:
+    """One mapped snapshot file. Positions index its columns; ids are in ascending order."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fp:
+            stat = os.fstat(fp.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{path} is not a recipe snapshot")
+        header_length = int.from_bytes(self._map[-_FOOTER:-len(MAGIC)], "little")
+        header = json.loads(self._map[-_FOOTER - header_length:-_FOOTER])
+        self.version = header.get("version", 0)  # The catalog version it was built at
+
+        def column(name):
+            spec = _Column(**header["columns"][name])
+            return np.frombuffer(self._map, dtype=spec.dtype, count=spec.length, offset=spec.offset)
+
+        self.ids = column("ids")
+        self.rating = column("rating")  # NaN when unrated
+        self.vegetarian = column("vegetarian")
+        self.by_rating = column("by_rating")
+        self.digest = column("digest")
+        self._json_start = header["json"][0]
+        self._json_offsets = column("json_offsets")
+        self._ingredients_start = header["ingredients"][0]
+        self._ingredient_offsets = column("ingredient_offsets")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, recipe_id: int) -> int | None:
+        position = int(np.searchsorted(self.ids, recipe_id))
+        if position < len(self.ids) and self.ids[position] == recipe_id:
+            return position
+        return None
+
+    def get(self, recipe_id: int) -> bytes | None:
+        """A recipe's RecipeOutput JSON."""
+        position = self.position(recipe_id)
+        return None if position is None else self._json(position)
+
+    def record(self, position: int) -> catalog.StoredRecipe:
+        start, end = self._ingredient_offsets[position:position + 2] + self._ingredients_start
+        ingredients = tuple(self._map[start:end].decode().split("\0")) if end > start else ()
+        rating = float(self.rating[position])
+        return catalog.StoredRecipe(
+            int(self.ids[position]), None if np.isnan(rating) else rating, bool(self.vegetarian[position]), ingredients
+        )
+
+    def select(
+        self,
+        rating: float | None = None,
+        vegetarian: bool | None = None,
+        ids: set[int] | None = None,
+        order: SortOrder = SortOrder.id,
+        after: list | None = None,
+    ) -> np.ndarray:
+        """Positions of the recipes passing the filters, in sort order, after the `after` key."""
+        mask = np.ones(len(self.ids), dtype=np.bool_)
+        if rating is not None:
+            mask &= self.rating >= rating  # NaN never passes
+        if vegetarian is not None:
+            mask &= self.vegetarian == vegetarian
+        if ids is not None:
+            wanted = np.fromiter(ids, dtype=np.int64, count=len(ids))
+            positions = np.searchsorted(self.ids, wanted)
+            found = positions < len(self.ids)
+            found[found] = self.ids[positions[found]] == wanted[found]
+            matched = np.zeros(len(self.ids), dtype=np.bool_)
+            matched[positions[found]] = True
+            mask &= matched
+        if after is not None:
+            mask &= self._after(order, after)
+
+        if order is SortOrder.id:
+            return np.flatnonzero(mask)
+        return self.by_rating[mask[self.by_rating]]
+
+    def page(self, positions: np.ndarray, order: SortOrder, limit: int | None) -> tuple[bytes, str | None]:
+        """The JSON array of up to `limit` of `positions`, and the cursor of the next page."""
+        next_cursor = None
+        if limit is not None and len(positions) > limit:
+            positions = positions[:limit]
+            next_cursor = encode_cursor(self.record(positions[-1]), order)
+        return b"[" + b",".join(self._iter_json(positions)) + b"]", next_cursor
+
+    def iter_ndjson(self, positions: np.ndarray) -> Iterator[bytes]:
+        for start in range(0, len(positions), STREAM_BATCH_SIZE):
+            yield b"".join(body + b"\n" for body in self._iter_json(positions[start:start + STREAM_BATCH_SIZE]))
+
+    def _after(self, order: SortOrder, after: list) -> np.ndarray:
+        # Same ordering as pagination.keyset_ranges
+        if order is SortOrder.id:
+            return self.ids > after[0]
+        rating, recipe_id = after
+        unrated = np.isnan(self.rating)
+        if rating is None:
+            return unrated & (self.ids < recipe_id)
+        return (self.rating < rating) | ((self.rating == rating) & (self.ids < recipe_id)) | unrated
+
+    def _json(self, position: int) -> bytes:
+        start, end = self._json_offsets[position:position + 2] + self._json_start
+        return self._map[start:end]
+
+    def _iter_json(self, positions: np.ndarray) -> Iterator[bytes]:
+        starts = (self._json_offsets[positions] + self._json_start).tolist()
+        ends = (self._json_offsets[positions + 1] + self._json_start).tolist()
+        return map(self._map.__getitem__, map(slice, starts, ends))
+
+
+class SnapshotServer:
+    """
+    Keeps the current Snapshot mapped, rebuilds the file after this worker's
+    writes and picks up files rebuilt by other workers.
+    """
+
+    def __init__(self):
+        self.current: Snapshot | None = None
+        self._engine: Engine | None = None
+        self._path = ""
+        self._dirty = threading.Event()
+        self._own_writes = False
+        # Catalog version the file has to reach after writes by other processes
+        self._wanted_version = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Set while replaying a snapshot, so its notifications do not count as writes
+        self._replaying = threading.local()
+        # Recipes this worker wrote since the mapped snapshot was built, with the
+        # catalog version of the write; the snapshot holds their old state
+        self._written_ids: dict[int, int] = {}
+        self._written_lock = threading.Lock()
+
+    def start(self, engine: Engine, path: str):
+        """Map the snapshot (building it first if missing or stale) and feed it to the catalog listeners."""
+        self._engine, self._path = engine, path
+        with self._build_lock():
+            # Missing, or older than writes made while no server was watching
+            if self._file_version() < catalog.stored_version(engine):
+                logger.info("building snapshot %s", path)
+                build(engine, path)
+        self._load()
+        catalog.subscribe(self)
+        self._thread = threading.Thread(target=self._watch, name="snapshot-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def recipes_saved(self, recipes):
+        self._written([recipe.id for recipe in recipes])
+
+    def recipes_removed(self, recipe_ids):
+        self._written(recipe_ids)
+
+    def serving(self, recipe_id: int | None = None) -> Snapshot | None:
+        """
+        The snapshot to answer a read from, or None to read the database instead:
+        until a snapshot with this worker's own writes is mapped, reads of the
+        written recipes, and every search, go to the database.
+        """
+        if recipe_id is None:
+            stale = bool(self._written_ids)
+        else:
+            stale = recipe_id in self._written_ids
+        return None if stale else self.current
+
+    def refresh(self, version: int):
+        """Rebuild for writes made by another process, unless a file of that version appears first."""
+        self._wanted_version = max(self._wanted_version, version)
+        self._dirty.set()
+
+    def _written(self, recipe_ids):
+        if not getattr(self._replaying, "active", False):
+            version = catalog.last_announced()
+            with self._written_lock:
+                self._written_ids.update(dict.fromkeys(recipe_ids, version))
+            self._own_writes = True
+            self._dirty.set()
+
+    def _build_lock(self):
+        # Serializes rebuilds across workers, so the last file written is never older than a committed write
+        return _FileLock(self._path + ".lock")
+
+    def _watch(self):
+        interval = settings.SNAPSHOT_RELOAD_SECONDS
+        while not self._stopped.is_set():
+            try:
+                if self._dirty.wait(interval):
+                    # Let a burst of writes settle into one rebuild
+                    if self._stopped.wait(interval):
+                        return
+                    self._dirty.clear()
+                    own_writes, self._own_writes = self._own_writes, False
+                    with self._build_lock():
+                        # Every worker notices a write by another; the first one to get here rebuilds for all
+                        if own_writes or self._file_version() < self._wanted_version:
+                            build(self._engine, self._path)
+                self._load()
+            except Exception:
+                logger.exception("snapshot refresh failed")
+                self._stopped.wait(interval)
+
+    def _file_version(self) -> int:
+        try:
+            return Snapshot(self._path).version
+        except (FileNotFoundError, ValueError):
+            return -1
+
+    def _load(self):
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return
+        previous = self.current
+        if previous is not None and previous.identity == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return
+        snapshot = Snapshot(self._path)
+        self._replaying.active = True
+        try:
+            self._replay(previous, snapshot)
+        finally:
+            self._replaying.active = False
+        # Requests holding the previous snapshot keep it (and its mapping) alive until they finish
+        self.current = snapshot
+        with self._written_lock:
+            # A build reads the catalog version before the data, so it has every write up to it
+            self._written_ids = {
+                recipe_id: version for recipe_id, version in self._written_ids.items() if version > snapshot.version
+            }
+        logger.info("serving snapshot of %d recipes", len(snapshot))
+
+    @staticmethod
+    def _replay(previous: Snapshot | None, snapshot: Snapshot):
+        """Announce what changed between two snapshots (everything, at startup)."""
+        if previous is None:
+            changed = np.arange(len(snapshot))
+        else:
+            positions = np.minimum(np.searchsorted(previous.ids, snapshot.ids), max(len(previous) - 1, 0))
+            same = np.zeros(len(snapshot), dtype=np.bool_)
+            if len(previous):
+                same = (previous.ids[positions] == snapshot.ids) & (previous.digest[positions] == snapshot.digest)
+            changed = np.flatnonzero(~same)
+            removed = np.setdiff1d(previous.ids, snapshot.ids)
+            if len(removed):
+                catalog.recipes_removed(removed.tolist())
+        for start in range(0, len(changed), REPLAY_BATCH_SIZE):
+            catalog.recipes_saved([snapshot.record(position) for position in changed[start:start + REPLAY_BATCH_SIZE]])
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        self._fp = open(self.path, "a")
+        fcntl.flock(self._fp, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fp, fcntl.LOCK_UN)
+        self._fp.close()
+
+
+snapshot_server = SnapshotServer()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import engine
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", nargs="?", default=settings.SNAPSHOT_PATH or "recipes.snapshot")
+    args = parser.parse_args()
+    build(engine, args.path)
+    print(f"{len(Snapshot(args.path))} recipes written to {args.path}")
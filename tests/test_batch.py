@@ -0,0 +1,45 @@
+from sqlalchemy import event
+
+from bench.generate import generate
+from conftest import recipe_body
+
+
+def test_batch_create_inserts_every_recipe_in_one_statement(client):
+    from db import async_engine
+
+    recipes = list(generate(200, seed=11))
+    assert any(recipe["rating"] is None for recipe in recipes)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        response = client.post("/recipes/batch/create", json=recipes)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["recipe"]["title"] for result in results] == [recipe["title"] for recipe in recipes]
+    assert sum(statement.startswith("INSERT INTO recipe ") for statement in statements) == 1
+
+
+def test_writes_reusing_a_natural_key_conflict(client):
+    taken, free = recipe_body("Conflict pie", ["1 egg"]), recipe_body("Conflict tart", ["1 egg"])
+    first = client.post("/recipes/", json=taken).json()
+    assert client.post("/recipes/", json=taken).status_code == 409
+
+    results = client.post("/recipes/batch/create", json=[taken, free, free]).json()
+    assert [result["status"] for result in results] == [409, 200, 409]
+    second = results[1]["id"]
+
+    assert client.put(f"/recipes/{second}", json=taken).status_code == 409
+    # Keeping its own key is not a conflict
+    assert client.put(f"/recipes/{first['id']}", json=dict(taken, method="Bake.")).status_code == 200
+
+    results = client.post("/recipes/batch/update", json=[
+        dict(taken, id=second), dict(recipe_body("Conflict flan", ["1 egg"]), id=second),
+    ]).json()
+    # The later item for an id wins, and its key is free
+    assert [result["status"] for result in results] == [200, 200]
+    results = client.post("/recipes/batch/update", json=[dict(taken, id=second)]).json()
+    assert results[0]["status"] == 409
+    assert client.get(f"/recipes/{second}").json()["title"] == "Conflict flan"
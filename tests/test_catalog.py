@@ -0,0 +1,97 @@
+import time
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+import catalog
+from conftest import recipe_body
+from db import engine
+from ingredient_index import ingredient_index
+
+
+def _logged_since(version: int) -> set[int]:
+    return set().union(*catalog.changes(engine, version, catalog.stored_version(engine)).values())
+
+
+def test_every_write_logs_the_recipes_it_touched(client):
+    version = catalog.stored_version(engine)
+    created = client.post("/recipes/", json=recipe_body("Logged pie", ["1 egg"])).json()["id"]
+    assert _logged_since(version) == {created}
+
+    version = catalog.stored_version(engine)
+    client.put(f"/recipes/{created}", json=recipe_body("Logged pie", ["2 eggs"]))
+    results = client.post("/recipes/batch/create", json=[recipe_body("Logged tart", ["1 egg"])]).json()
+    assert _logged_since(version) == {created, results[0]["id"]}
+
+    version = catalog.stored_version(engine)
+    client.post("/recipes/batch/update", json=[dict(recipe_body("Logged tart", ["3 eggs"]), id=results[0]["id"])])
+    client.post("/recipes/batch/delete", json={"ids": [results[0]["id"], 10**9]})
+    client.delete(f"/recipes/{created}")
+    assert _logged_since(version) == {created, results[0]["id"]}
+
+    # Nothing written, nothing logged
+    version = catalog.stored_version(engine)
+    client.post("/recipes/batch/delete", json={"ids": [10**9]})
+    assert catalog.stored_version(engine) == version
+
+
+def _write_elsewhere(statements: list[tuple[str, dict]], recipe_ids: list[int]):
+    """Write as another process would: no notifications and no announced version."""
+    with Session(engine) as session:
+        for statement, params in statements:
+            session.execute(text(statement), params)
+        catalog.record_changes(session, recipe_ids)
+        session.commit()
+
+
+def _eventually(condition):
+    deadline = time.monotonic() + 10
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert condition()
+
+
+def test_watcher_applies_other_processes_updates_and_deletions(client):
+    kept = client.post("/recipes/", json=recipe_body("Elsewhere stew", ["1 gorbleroot"])).json()["id"]
+    gone = client.post("/recipes/", json=recipe_body("Elsewhere soup", ["1 gorbleroot"])).json()["id"]
+    assert ingredient_index.lookup("gorbleroot") == {kept, gone}
+    client.get(f"/recipes/{gone}")  # Cached
+
+    watcher = catalog.VersionWatcher()
+    watcher.start(engine, lambda version, recipe_ids: catalog.reload(engine, recipe_ids), 0.02)
+    try:
+        _write_elsewhere([
+            ("UPDATE recipeingredient SET name = '1 flimbleweed' WHERE recipe_id = :id", {"id": kept}),
+            ("DELETE FROM recipeingredient WHERE recipe_id = :id", {"id": gone}),
+            ("DELETE FROM recipe WHERE id = :id", {"id": gone}),
+        ], [kept, gone])
+        _eventually(lambda: ingredient_index.lookup("gorbleroot") == set())
+        assert ingredient_index.lookup("flimbleweed") == {kept}
+        assert client.get(f"/recipes/{gone}").status_code == 404
+        assert client.get(f"/recipes/{kept}").json()["ingredients"] == ["1 flimbleweed"]
+    finally:
+        watcher.stop()
+        client.delete(f"/recipes/{kept}")
+
+
+def test_watcher_skips_its_own_writes_and_reloads_after_a_gap(client):
+    watcher = catalog.VersionWatcher()
+    reloads = []
+    # Stepped by hand rather than by the polling thread
+    watcher.start(engine, lambda version, recipe_ids: reloads.append(recipe_ids), 3600)
+    try:
+        recipe_id = client.post("/recipes/", json=recipe_body("Pruned pie", ["1 egg"])).json()["id"]
+        watcher._catch_up(catalog.stored_version(engine))
+        assert reloads == []
+
+        _write_elsewhere([], [recipe_id])
+        watcher._catch_up(catalog.stored_version(engine))
+        assert reloads == [{recipe_id}]
+
+        _write_elsewhere([], [recipe_id])
+        catalog.prune_changes(engine, time.time() + 1)
+        watcher._catch_up(catalog.stored_version(engine))
+        assert reloads == [{recipe_id}, None]
+    finally:
+        watcher.stop()
+        client.delete(f"/recipes/{recipe_id}")
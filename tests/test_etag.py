@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import recipe_body
+from serialization import make_etag
+
+
+@pytest.mark.parametrize("url", [
+    "/recipes/?limit=10",
+    "/recipes/search?sort=rating&vegetarian=true&limit=10",
+    "/recipes/ingresearch?keyword=salt",
+    "/recipes/facets?ingredients=salt",
+])
+def test_lists_answer_304_for_a_matching_etag(client, url):
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert etag == make_etag(response.content)
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    assert cached.headers.get("X-Next-Cursor") == response.headers.get("X-Next-Cursor")
+
+    # Weak and listed tags match too; a different tag does not
+    assert client.get(url, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_recipe_etag_changes_with_the_recipe(client):
+    recipe_id = client.post("/recipes/", json=recipe_body("Etag pie", ["1 egg"])).json()["id"]
+    try:
+        response = client.get(f"/recipes/{recipe_id}")
+        etag = response.headers["ETag"]
+        assert etag == make_etag(response.content)
+        assert client.get(f"/recipes/{recipe_id}", headers={"If-None-Match": etag}).status_code == 304
+
+        client.put(f"/recipes/{recipe_id}", json=recipe_body("Etag pie", ["2 eggs"]))
+        changed = client.get(f"/recipes/{recipe_id}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["ingredients"] == ["2 eggs"]
+        assert changed.headers["ETag"] != etag
+    finally:
+        client.delete(f"/recipes/{recipe_id}")
+    assert client.get(f"/recipes/{recipe_id}", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_list_etag_changes_after_a_write(client):
+    url = "/recipes/ingresearch?keyword=etag+quince"
+    etag = client.get(url).headers["ETag"]
+    recipe_id = client.post("/recipes/", json=recipe_body("Etag tart", ["1 etag quince"])).json()["id"]
+    try:
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert [recipe["id"] for recipe in response.json()] == [recipe_id]
+    finally:
+        client.delete(f"/recipes/{recipe_id}")
@@ -0,0 +1,99 @@
+import random
+from collections import Counter
+
+import pytest
+
+from bench.generate import generate
+from catalog import StoredRecipe
+from facets import RATING_BUCKETS, UNRATED, FacetIndex, rating_bucket
+from ingredient_index import normalize_ingredient
+
+
+def _catalog(count: int, seed: int, first_id: int = 1) -> dict[int, StoredRecipe]:
+    return {
+        recipe_id: StoredRecipe(recipe_id, recipe["rating"], recipe["vegetarian"], tuple(recipe["ingredients"]))
+        for recipe_id, recipe in enumerate(generate(count, seed), start=first_id)
+    }
+
+
+def _recount(recipes, ids=None, rating=None, vegetarian=None) -> dict:
+    """FacetIndex.facets counted from scratch, with every ingredient listed."""
+    by_flag = {"true": 0, "false": 0}
+    by_rating = dict.fromkeys(RATING_BUCKETS + (UNRATED,), 0)
+    ingredients = Counter()
+    for recipe in recipes.values():
+        if ids is not None and recipe.id not in ids:
+            continue
+        if vegetarian is not None and recipe.vegetarian != vegetarian:
+            continue
+        if rating is not None and (recipe.rating is None or recipe.rating < rating):
+            continue
+        by_flag["true" if recipe.vegetarian else "false"] += 1
+        by_rating[rating_bucket(recipe.rating)] += 1
+        ingredients.update(set(filter(None, map(normalize_ingredient, recipe.ingredients))))
+    return {"total": sum(by_flag.values()), "vegetarian": by_flag, "rating": by_rating, "ingredients": ingredients}
+
+
+FILTERS = [
+    {},
+    {"vegetarian": True},
+    {"rating": 4.2},
+    {"rating": 3, "vegetarian": False},
+    {"rating": 0.0},
+]
+
+
+def _check(index: FacetIndex, recipes: dict, filters: dict):
+    expected = _recount(recipes, **filters)
+    facets = index.facets(**filters, top=10)
+    counts = [item["count"] for item in facets["ingredients"]]
+    assert {key: facets[key] for key in ("total", "vegetarian", "rating")} == {
+        key: expected[key] for key in ("total", "vegetarian", "rating")
+    }
+    # Ties at the cut-off may pick either name, so compare counts and then each listed name
+    assert counts == sorted(expected["ingredients"].values(), reverse=True)[:10]
+    for item in facets["ingredients"]:
+        assert expected["ingredients"][item["name"]] == item["count"]
+
+    everything = index.facets(**filters, top=10_000)["ingredients"]
+    assert {item["name"]: item["count"] for item in everything} == dict(expected["ingredients"])
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_running_counts_match_a_recount_after_writes(filters):
+    rng = random.Random(5)
+    recipes = _catalog(600, seed=21)
+    index = FacetIndex()
+    index.recipes_saved(list(recipes.values()))
+    _check(index, recipes, filters)
+
+    # Updates move recipes between cells, and may empty a cell entirely
+    updated = rng.sample(sorted(recipes), 150)
+    for recipe_id, replacement in zip(updated, _catalog(150, seed=22).values()):
+        recipes[recipe_id] = replacement._replace(id=recipe_id)
+    index.recipes_saved([recipes[recipe_id] for recipe_id in updated])
+    _check(index, recipes, filters)
+
+    removed = rng.sample(sorted(recipes), 250)
+    for recipe_id in removed:
+        del recipes[recipe_id]
+    index.recipes_removed(removed)
+    _check(index, recipes, filters)
+
+    created = _catalog(100, seed=23, first_id=1000)
+    recipes.update(created)
+    index.recipes_saved(list(created.values()))
+    _check(index, recipes, filters)
+
+    ids = set(rng.sample(sorted(recipes), 200))
+    assert index.facets(ids, **filters, top=10_000)["total"] == _recount(recipes, ids, **filters)["total"]
+
+
+def test_emptied_cells_are_dropped():
+    index = FacetIndex()
+    recipe = StoredRecipe(1, 4.5, True, ("1 egg",))
+    index.recipes_saved([recipe])
+    index.recipes_saved([recipe._replace(rating=2.0)])
+    index.recipes_removed([1])
+    assert index.facets()["total"] == 0
+    assert index._cell_ingredients == {}
@@ -0,0 +1,51 @@
+import json
+
+from conftest import recipe_body
+
+
+def _titles(client, query: str) -> list[str]:
+    response = client.get("/recipes/fulltext", params={"q": query})
+    assert response.status_code == 200, response.text
+    return [recipe["title"] for recipe in response.json()]
+
+
+def test_single_recipe_writes_keep_the_index_in_step(client):
+    created = client.post("/recipes/", json=recipe_body("Quokka crumble", ["2 wombleberries", "1 sugar"])).json()
+    assert _titles(client, "wombleberry") == ["Quokka crumble"]
+
+    updated = recipe_body("Quokka fool", ["1 snozzcumber"], method="Whisk the glorpcream.")
+    assert client.put(f"/recipes/{created['id']}", json=updated).status_code == 200
+    assert _titles(client, "wombleberry") == []
+    assert _titles(client, "snozzcumber") == ["Quokka fool"]
+    assert _titles(client, "glorpcream") == ["Quokka fool"]
+    assert _titles(client, "crumble") == []
+
+    assert client.delete(f"/recipes/{created['id']}").status_code == 204
+    assert _titles(client, "snozzcumber") == []
+
+
+def test_batch_writes_keep_the_index_in_step(client):
+    results = client.post("/recipes/batch/create", json=[
+        recipe_body("Numbat pie", ["1 frobnut"]), recipe_body("Numbat tart", ["2 frobnuts", "1 egg"]),
+    ]).json()
+    ids = [result["id"] for result in results]
+    assert sorted(_titles(client, "frobnut")) == ["Numbat pie", "Numbat tart"]
+
+    client.post("/recipes/batch/update", json=[dict(recipe_body("Numbat pie", ["1 plumbus"]), id=ids[0])])
+    assert _titles(client, "frobnut") == ["Numbat tart"]
+    assert _titles(client, "plumbus") == ["Numbat pie"]
+
+    client.post("/recipes/batch/delete", json={"ids": ids})
+    assert _titles(client, "frobnut OR plumbus") == []
+
+
+def test_import_keeps_the_index_in_step(client):
+    lines = [recipe_body("Bilby stew", ["1 kg gribblefruit"]), recipe_body("Bilby soup", ["1 gribblefruit"])]
+    client.post("/recipes/import", content="\n".join(map(json.dumps, lines)))
+    assert sorted(_titles(client, "gribblefruit")) == ["Bilby soup", "Bilby stew"]
+
+    # Re-importing on the same (title, img) replaces the ingredients
+    lines[0]["ingredients"] = ["1 zibbleroot"]
+    client.post("/recipes/import", content=json.dumps(lines[0]))
+    assert _titles(client, "gribblefruit") == ["Bilby soup"]
+    assert _titles(client, "zibbleroot") == ["Bilby stew"]
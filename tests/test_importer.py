@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from bench.generate import generate
+from importer import MalformedRecord, existing_ids, iter_records
+
+
+RECIPES = list(generate(40, seed=7))
+
+
+@pytest.mark.parametrize("text", [
+    "\n".join(json.dumps(recipe) for recipe in RECIPES),
+    json.dumps(RECIPES, indent=2, ensure_ascii=False),
+])
+def test_records_straddling_reads_are_reassembled(text):
+    # Tiny reads cut every kind of token in half somewhere
+    assert list(iter_records(io.StringIO(text), chunk_size=7)) == RECIPES
+
+
+def test_malformed_record_stops_without_reading_ahead():
+    text = json.dumps(RECIPES[0]) + "\n" + '{"title": "x", oops}\n' + "\n".join(json.dumps(r) for r in RECIPES * 50)
+    fp = io.StringIO(text)
+    records = iter_records(fp, chunk_size=64)
+    assert next(records) == RECIPES[0]
+    with pytest.raises(MalformedRecord, match="record 1"):
+        next(records)
+    assert fp.tell() < 1024
+
+
+def test_import_writes_each_table_in_one_statement(client):
+    from db import engine
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        body = "\n".join(json.dumps(recipe) for recipe in generate(300, seed=8))
+        response = client.post("/recipes/import?batch_size=300", content=body)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert response.json()["inserted"] == 300
+    assert sum(statement.startswith("INSERT INTO recipe ") for statement in statements) == 1
+    assert sum(statement.startswith("INSERT INTO recipeingredient ") for statement in statements) == 1
+
+
+def test_import_reports_how_far_a_malformed_body_got(client):
+    recipes = list(generate(3, seed=9))
+    body = "\n".join(json.dumps(recipe) for recipe in recipes) + '\n{"title": nope}\n' + json.dumps(RECIPES[0])
+    response = client.post("/recipes/import", content=body)
+    assert response.status_code == 400
+    report = response.json()
+    assert report["inserted"] == 3
+    assert report["stopped"].startswith("record 3: invalid JSON")
+    titles = {recipe["title"] for recipe in client.get("/recipes/").json()}
+    assert {recipe["title"] for recipe in recipes} <= titles
+
+
+def test_reimport_updates_in_place_on_the_natural_key(client):
+    from db import engine
+
+    recipes = list(generate(50, seed=12))
+    first = client.post("/recipes/import", content="\n".join(json.dumps(recipe) for recipe in recipes)).json()
+    assert (first["inserted"], first["updated"]) == (50, 0)
+    keys = [(recipe["title"], recipe["img"]) for recipe in recipes]
+    with Session(engine) as session:
+        ids = existing_ids(session, keys)
+    assert len(set(ids.values())) == 50
+
+    recipes[0] = dict(recipes[0], method="Changed.", ingredients=["1 turnip"])
+    again = recipes + list(generate(5, seed=13))
+    second = client.post("/recipes/import", content="\n".join(json.dumps(recipe) for recipe in again)).json()
+    assert (second["inserted"], second["updated"]) == (5, 50)
+    with Session(engine) as session:
+        assert existing_ids(session, keys) == ids
+
+    changed = client.get(f"/recipes/{ids[keys[0]]}").json()
+    assert (changed["method"], changed["ingredients"]) == ("Changed.", ["1 turnip"])
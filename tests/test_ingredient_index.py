@@ -0,0 +1,59 @@
+from ingredient_index import IngredientIndex, normalize_ingredient, tokenize
+
+
+def test_tokenize_folds_accents():
+    assert tokenize("crème fraîche") == {"creme", "fraiche"}
+    assert tokenize("2 Jalapeños, finely chopped") == {"jalapeno"}
+    assert tokenize("Œufs") == {"oeuf"}
+
+
+def test_normalize_ingredient_folds_accents():
+    assert normalize_ingredient("200ml Crème Fraîche") == "creme fraiche"
+    assert normalize_ingredient("250g Red split lentils") == "red split lentil"
+
+
+def test_accented_lines_match_plain_queries():
+    index = IngredientIndex()
+    index.add(1, ["200ml crème fraîche", "1 jalapeño"])
+    index.add(2, ["1 lime"])
+
+    assert index.lookup("creme fraiche") == {1}
+    assert index.lookup("Crème Fraîche, jalapeno") == {1}
+    # Accent fragments must not become tokens of their own
+    assert index.lookup("me") == set()
+    assert index.lookup("che") == set()
+
+
+def test_terms_match_within_a_single_line():
+    index = IngredientIndex()
+    index.add(1, ["1 red onion", "200g green lentils"])
+    index.add(2, ["250g red split lentils"])
+    index.add(3, ["2 eggs", "1 aubergine"])
+    index.add(4, ["1 eggplant"])
+
+    assert index.lookup("red lentil") == {2}
+    assert index.lookup("lentil") == {1, 2}
+    assert index.lookup("red onion, green lentil") == {1}
+    assert index.lookup("red lentil, green lentil") == set()
+    assert index.lookup("red lentil, green lentil", match_all=False) == {1, 2}
+    # Whole words only
+    assert index.lookup("egg") == {3}
+    assert index.lookup("eggplant") == {4}
+    assert index.lookup("egg, eggplant", match_all=False) == {3, 4}
+
+
+def test_updates_and_removals_replace_postings():
+    index = IngredientIndex()
+    index.add(1, ["1 red onion", "200g green lentils"])
+    index.add(2, ["250g red split lentils"])
+
+    index.add(1, ["1 red lentil soup"])
+    assert index.lookup("red lentil") == {1, 2}
+    assert index.lookup("onion") == set()
+
+    index.remove(2)
+    assert index.lookup("red lentil") == {1}
+    assert index.lookup("split") == set()
+    index.remove(1)
+    assert len(index) == 0
+    assert index._postings == {}
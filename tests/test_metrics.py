@@ -0,0 +1,74 @@
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import metrics
+from conftest import recipe_body
+
+QUERIES = "recipes_http_request_sql_queries"
+
+
+def _sample(name: str, method: str, route: str) -> float:
+    """One sample of the /metrics exposition, 0 when the label set was never observed."""
+    pattern = rf'^{name}\{{method="{re.escape(method)}",route="{re.escape(route)}"\}} (\S+)$'
+    found = re.search(pattern, metrics.render(), re.MULTILINE)
+    return float(found.group(1)) if found else 0.0
+
+
+def _observed(method: str, route: str) -> tuple[float, float]:
+    """Requests seen and SQL statements counted for a route so far."""
+    return _sample(f"{QUERIES}_count", method, route), _sample(f"{QUERIES}_sum", method, route)
+
+
+def test_statements_are_counted_per_route():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine, "test")
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    # A sync endpoint runs in the threadpool, which the request's tally has to follow
+    @app.get("/metrics-test/{item_id}")
+    def three_statements(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT :id"), {"id": item_id})
+        return {}
+
+    @app.get("/metrics-test")
+    async def no_statements():
+        return {}
+
+    before = _observed("GET", "/metrics-test/{item_id}"), _observed("GET", "/metrics-test")
+    with TestClient(app) as client:
+        for item_id in (1, 2):
+            assert client.get(f"/metrics-test/{item_id}").status_code == 200
+        assert client.get("/metrics-test").status_code == 200
+    after = _observed("GET", "/metrics-test/{item_id}"), _observed("GET", "/metrics-test")
+
+    assert (after[0][0] - before[0][0], after[0][1] - before[0][1]) == (2, 6)
+    assert (after[1][0] - before[1][0], after[1][1] - before[1][1]) == (1, 0)
+    # Route templates, not raw paths, label the series
+    assert _observed("GET", "/metrics-test/1") == (0, 0)
+
+
+def test_metrics_endpoint_reports_the_app_routes(client):
+    created = _observed("POST", "/recipes/")
+    recipe_id = client.post("/recipes/", json=recipe_body("Metrics flan", ["2 eggs"])).json()["id"]
+    client.delete(f"/recipes/{recipe_id}")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    count, queries = (
+        float(re.search(rf'^{QUERIES}_{kind}{{method="POST",route="/recipes/"}} (\S+)$', response.text, re.MULTILINE)
+              .group(1))
+        for kind in ("count", "sum")
+    )
+    assert count == created[0] + 1
+    # At least the insert and its change-log rows
+    assert queries > created[1]
+    assert _observed("DELETE", "/recipes/{id}")[1] > 0
+    assert f'{QUERIES}_count{{method="GET",route="/metrics"}}' in metrics.render()
+    assert _observed("GET", "/metrics")[1] == 0
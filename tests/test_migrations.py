@@ -0,0 +1,39 @@
+import os
+
+from sqlalchemy import text
+from sqlmodel import SQLModel
+
+import schemas  # noqa: F401  (registers the tables)
+from db import make_engine
+from migrations import migrate
+
+
+def test_duplicate_natural_keys_keep_the_newest(data_dir):
+    path = os.path.join(data_dir, "duplicates.db")
+    engine = make_engine(path)
+    try:
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            # As created before (title, img) was unique
+            conn.exec_driver_sql("DROP INDEX ix_recipe_title_img")
+            conn.exec_driver_sql("CREATE INDEX ix_recipe_title_img ON recipe (title, img)")
+            for recipe_id, title in [(1, "Pie"), (2, "Tart"), (3, "Pie"), (4, "Pie")]:
+                conn.execute(text(
+                    "INSERT INTO recipe (id, title, method, img, vegetarian) VALUES (:id, :title, 'Bake.', 'pie.jpg', 1)"
+                ), {"id": recipe_id, "title": title})
+                conn.execute(text(
+                    "INSERT INTO recipeingredient (recipe_id, position, name) VALUES (:id, 0, :name)"
+                ), {"id": recipe_id, "name": f"{recipe_id} egg"})
+
+        migrate(engine)
+        migrate(engine)
+
+        with engine.connect() as conn:
+            assert list(conn.execute(text("SELECT id FROM recipe ORDER BY id")).scalars()) == [2, 4]
+            assert list(conn.execute(text("SELECT recipe_id FROM recipeingredient ORDER BY recipe_id")).scalars()) == [2, 4]
+            assert list(conn.execute(text("SELECT rowid FROM recipe_fts WHERE recipe_fts MATCH 'egg' ORDER BY rowid")).scalars()) == [2, 4]
+            assert conn.execute(text("SELECT version FROM catalogversion")).scalar() == 1
+            unique = {row[1]: row[2] for row in conn.exec_driver_sql("PRAGMA index_list(recipe)")}
+            assert unique["ix_recipe_title_img"] == 1
+    finally:
+        engine.dispose()
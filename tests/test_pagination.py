@@ -0,0 +1,82 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy.dialects import sqlite
+from sqlmodel import select
+
+from conftest import walk
+from db import engine
+from pagination import SortOrder, keyset_ranges
+from routers.recipes import search_criteria
+from schemas import Recipe
+
+
+def _cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+@pytest.mark.parametrize("url", [
+    "/recipes/",
+    "/recipes/ratesearch?rating=3.5",
+    "/recipes/search?sort=rating",
+    "/recipes/search?sort=rating&vegetarian=true",
+    "/recipes/search?sort=rating&ingredients=salt",
+    "/recipes/ingresearch?keyword=salt,egg&match=any",
+])
+def test_pages_add_up_to_the_whole_result(client, url):
+    everything = client.get(url).json()
+    assert len(everything) > 50
+    assert walk(client, url, 37) == everything
+
+
+def _plans(queries) -> list[str]:
+    plans = []
+    with engine.connect() as conn:
+        for query in queries:
+            sql = query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+            plans.append(" / ".join(row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")))
+    return plans
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"vegetarian": True}, {"rating": 4.2}, {"vegetarian": False, "rating": 3.0},
+])
+@pytest.mark.parametrize("after", [None, [250]])
+def test_id_order_walks_the_rowid(client, filters, after):
+    where, _ = search_criteria(**filters, order=SortOrder.id)
+    for plan in _plans(keyset_ranges(select(Recipe).where(*where), SortOrder.id, after)):
+        assert "TEMP B-TREE" not in plan and "USING INDEX" not in plan, plan
+
+
+@pytest.mark.parametrize("filters", [{}, {"vegetarian": True}, {"vegetarian": False, "rating": 3.0}])
+@pytest.mark.parametrize("after", [None, [4.0, 250], [None, 250]])
+def test_rating_order_walks_an_index(client, filters, after):
+    where, _ = search_criteria(**filters, order=SortOrder.rating)
+    ranges = keyset_ranges(select(Recipe).where(*where), SortOrder.rating, after, "rating" in filters)
+    for plan in _plans(ranges):
+        assert "TEMP B-TREE" not in plan and "USING INDEX ix_recipe_" in plan, plan
+
+
+def test_rating_order(client):
+    recipes = client.get("/recipes/search?sort=rating").json()
+    keys = [(recipe["rating"] is None, -(recipe["rating"] or 0), -recipe["id"]) for recipe in recipes]
+    assert keys == sorted(keys)
+    assert recipes[-1]["rating"] is None
+
+
+@pytest.mark.parametrize("url", [
+    "/recipes/?limit=5",
+    "/recipes/ingresearch?keyword=salt&limit=5",
+    "/recipes/ratesearch?rating=3&limit=5",
+    "/recipes/search?ingredients=salt&sort=rating&limit=5",
+    "/recipes/fulltext?q=onion&limit=5",
+])
+@pytest.mark.parametrize("key", [["a"], ["x", 1], [4.5, "x"], [True, 1], [1.5], [None, None], [1, 2, 3]])
+def test_cursors_of_the_wrong_shape_are_rejected(client, url, key):
+    response = client.get(f"{url}&cursor={_cursor(key)}")
+    assert response.status_code == 400
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get("/recipes/", params={"cursor": "not base64!"}).status_code == 400
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from bench.generate import generate
+from catalog import StoredRecipe
+from conftest import recipe_body
+from ingredient_index import tokenize
+from pantry import PantryMatrix
+
+
+def _catalog(count: int, seed: int, first_id: int = 1) -> dict[int, StoredRecipe]:
+    return {
+        recipe_id: StoredRecipe(recipe_id, recipe["rating"], recipe["vegetarian"], tuple(recipe["ingredients"]))
+        for recipe_id, recipe in enumerate(generate(count, seed), start=first_id)
+    }
+
+
+def _reference(recipes, pantry, vegetarian=None, min_rating=None) -> list[tuple]:
+    """Brute-force PantryMatrix.match over every candidate, in a tie-free order."""
+    items = [tokenize(item) for item in pantry]
+    items = [item for item in items if item]
+    results = []
+    for recipe in recipes.values():
+        if vegetarian is not None and recipe.vegetarian != vegetarian:
+            continue
+        if min_rating is not None and (recipe.rating is None or recipe.rating < min_rating):
+            continue
+        lines = [tokenize(line) for line in recipe.ingredients]
+        missing = [
+            line for line, tokens in zip(recipe.ingredients, lines)
+            if tokens and not any(item <= tokens for item in items)
+        ]
+        needed = sum(map(bool, lines))
+        have = needed - len(missing)
+        if have:
+            results.append((recipe.id, round(have / needed, 9), have, missing))
+    return _in_order(results, recipes)
+
+
+def _in_order(results, recipes) -> list[tuple]:
+    def key(result):
+        rating = recipes[result[0]].rating
+        return -result[1], len(result[3]), -(rating if rating is not None else -1.0), result[0]
+    return sorted(results, key=key)
+
+
+def _match(matrix, recipes, pantry, **filters) -> list[tuple]:
+    matches = matrix.match(pantry, limit=len(recipes), **filters)
+    return _in_order([(m.recipe_id, round(m.coverage, 9), m.have, m.missing) for m in matches], recipes)
+
+
+PANTRIES = [
+    ["egg", "milk", "plain flour", "butter", "sugar"],
+    ["onion", "garlic", "tomato", "olive oil", "rice", "chickpeas"],
+    ["salt", "black pepper"],
+    ["smoked paprika", "lentils", "1 tsp", "unknownium"],
+]
+
+
+def test_matches_agree_with_brute_force_across_compactions():
+    rng = random.Random(3)
+    matrix = PantryMatrix()
+    recipes = _catalog(1500, seed=1)
+    matrix.recipes_saved(list(recipes.values()))
+
+    # Updates append rows and deletes retire them, until half the rows are dead
+    targets = rng.sample(sorted(recipes), 800)
+    updated = {
+        recipe_id: recipe._replace(id=recipe_id) for recipe_id, recipe in zip(targets, _catalog(800, seed=2).values())
+    }
+    recipes.update(updated)
+    matrix.recipes_saved(list(updated.values()))
+    removed = rng.sample(sorted(recipes), 700)
+    for recipe_id in removed:
+        del recipes[recipe_id]
+    matrix.recipes_removed(removed)
+    assert matrix._recipe_ids.size == len(recipes), "expected the matrix to compact"
+
+    # Writes after the compaction land on the compacted arrays
+    more = _catalog(300, seed=4, first_id=5000)
+    recipes.update(more)
+    matrix.recipes_saved(list(more.values()))
+    assert len(matrix) == len(recipes)
+
+    for pantry in PANTRIES:
+        for filters in ({}, {"vegetarian": True}, {"vegetarian": False, "min_rating": 4.0}):
+            expected = _reference(recipes, pantry, **filters)
+            assert expected
+            assert _match(matrix, recipes, pantry, **filters) == expected
+
+
+@pytest.mark.parametrize("limit", [1, 5, 20])
+def test_limit_keeps_the_best_matches(limit):
+    matrix = PantryMatrix()
+    recipes = _catalog(500, seed=5)
+    matrix.recipes_saved(list(recipes.values()))
+    matches = matrix.match(PANTRIES[0], limit=limit)
+    expected = _reference(recipes, PANTRIES[0])
+    assert len(matches) == limit
+    assert [round(match.coverage, 9) for match in matches] == [result[1] for result in expected[:limit]]
+
+
+def test_missing_lines_come_from_the_matrix(client):
+    from pantry import pantry_matrix
+
+    recipe_id = client.post("/recipes/", json=recipe_body("Stale flan", ["1 zorbfruit"])).json()["id"]
+    # As if another worker had changed the recipe and this one had not caught up yet
+    stale = StoredRecipe(recipe_id, 4.0, True, ("1 zorbfruit", "2 plonkberries", "1 tsp", "3 quibbles"))
+    pantry_matrix.recipes_saved([stale])
+    try:
+        response = client.post("/recipes/pantry", json={"ingredients": ["zorbfruit"], "limit": 5})
+        assert response.status_code == 200, response.text
+        [result] = [result for result in response.json() if result["recipe"]["id"] == recipe_id]
+        assert result["missing_ingredients"] == ["2 plonkberries", "3 quibbles"]
+    finally:
+        client.delete(f"/recipes/{recipe_id}")
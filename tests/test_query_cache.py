@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import recipe_body
+from query_cache import QueryCache
+
+
+def test_entries_are_evicted_least_recently_used_first():
+    cache = QueryCache(max_entries=2, max_bytes=100, ttl=60)
+    cache.put("a", 1, 10, cache.generation)
+    cache.put("b", 2, 10, cache.generation)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 10, cache.generation)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    cache.put("d", 4, 95, cache.generation)
+    assert cache.stats()["bytes"] <= 100
+    # Larger than the whole cache: not stored, nothing evicted for it
+    cache.put("e", 5, 101, cache.generation)
+    assert cache.get("e") is None
+    assert cache.get("d") == 4
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    import query_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(max_entries=10, max_bytes=100, ttl=5)
+    cache.put("a", 1, 10, cache.generation)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("write", ["saved", "removed"])
+def test_writes_invalidate_and_discard_results_of_the_old_generation(write):
+    cache = QueryCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.put("a", 1, 10, cache.generation)
+    # A query started before the write finishes after it
+    started = cache.generation
+    if write == "saved":
+        cache.recipes_saved([])
+    else:
+        cache.recipes_removed([])
+    assert cache.get("a") is None
+    cache.put("b", 2, 10, started)
+    assert cache.get("b") is None
+    cache.put("b", 2, 10, cache.generation)
+    assert cache.get("b") == 2
+
+
+def test_search_results_follow_writes(client):
+    url = "/recipes/ingresearch?keyword=yuzu+marmalade"
+    # The empty result is cached now; the create has to drop it
+    assert client.get(url).json() == []
+    recipe_id = client.post("/recipes/", json=recipe_body("Yuzu toast", ["2 tbsp yuzu marmalade"])).json()["id"]
+    try:
+        assert [recipe["id"] for recipe in client.get(url).json()] == [recipe_id]
+    finally:
+        client.delete(f"/recipes/{recipe_id}")
+    assert client.get(url).json() == []
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+
+from bench.generate import generate
+from catalog import StoredRecipe
+from ingredient_index import normalize_ingredient
+from similar import SimilarityIndex
+
+
+def _names(recipe: StoredRecipe) -> set[str]:
+    return set(filter(None, map(normalize_ingredient, recipe.ingredients)))
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+def _catalog() -> dict[int, StoredRecipe]:
+    recipes = {
+        recipe_id: StoredRecipe(recipe_id, recipe["rating"], recipe["vegetarian"], tuple(recipe["ingredients"]))
+        for recipe_id, recipe in enumerate(generate(400, seed=31), start=1)
+    }
+    # Near-duplicates one line short of an original, so there are truly similar pairs to find
+    rng = random.Random(6)
+    for offset, original in enumerate(rng.sample(sorted(recipes), 40)):
+        lines = list(recipes[original].ingredients)
+        lines.pop(rng.randrange(len(lines)))
+        recipes[1000 + offset] = StoredRecipe(1000 + offset, None, False, tuple(lines))
+    return recipes
+
+
+def test_neighbours_agree_with_exact_jaccard():
+    recipes = _catalog()
+    index = SimilarityIndex()
+    index.recipes_saved(list(recipes.values()))
+    names = {recipe_id: _names(recipe) for recipe_id, recipe in recipes.items()}
+
+    errors, similar_pairs, found = [], 0, 0
+    for recipe_id in random.Random(7).sample(sorted(recipes), 80) + list(range(1000, 1040)):
+        neighbours = dict(index.similar(recipe_id, limit=len(recipes)))
+        for other, estimate in neighbours.items():
+            errors.append(abs(estimate - _jaccard(names[recipe_id], names[other])))
+        for other in recipes:
+            if other != recipe_id and _jaccard(names[recipe_id], names[other]) >= 0.6:
+                similar_pairs += 1
+                found += other in neighbours
+
+    # 96 slots give a standard error of at most 0.05 per estimate
+    assert np.mean(errors) < 0.05
+    assert np.percentile(errors, 99) < 0.2
+    assert similar_pairs >= 40
+    # Three-row bands put pairs at 0.6 in a shared bucket with probability > 0.999
+    assert found / similar_pairs > 0.95
+
+
+def test_the_closest_recipe_comes_first():
+    recipes = _catalog()
+    index = SimilarityIndex()
+    index.recipes_saved(list(recipes.values()))
+    names = {recipe_id: _names(recipe) for recipe_id, recipe in recipes.items()}
+
+    for recipe_id in range(1000, 1040):
+        [(best, _)] = index.similar(recipe_id, limit=1)
+        exact = max(_jaccard(names[recipe_id], names[other]) for other in recipes if other != recipe_id)
+        assert _jaccard(names[recipe_id], names[best]) >= exact - 0.15
+
+
+def test_updates_and_removals_leave_the_buckets():
+    recipes = _catalog()
+    index = SimilarityIndex()
+    index.recipes_saved(list(recipes.values()))
+    original = next(recipe_id for recipe_id in recipes if recipe_id < 1000 and 1000 in dict(index.similar(recipe_id, 50)))
+
+    index.recipes_removed([1000])
+    assert 1000 not in dict(index.similar(original, len(recipes)))
+    index.recipes_saved([recipes[original]._replace(id=1000)])
+    assert index.similar(original, 1) == [(1000, 1.0)]
+    index.recipes_saved([StoredRecipe(1000, None, False, ("1 tsp",))])
+    assert 1000 not in index
+    assert 1000 not in dict(index.similar(original, len(recipes)))
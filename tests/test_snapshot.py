@@ -0,0 +1,185 @@
+import os
+import time
+
+import pytest
+
+import catalog
+import settings
+from conftest import recipe_body, walk
+from facets import FacetIndex
+from query_cache import query_cache
+from snapshot import Snapshot, SnapshotServer, build, snapshot_server
+
+URLS = [
+    "/recipes/",
+    "/recipes/vegsearch?vegetarian=true",
+    "/recipes/ratesearch?rating=4.2",
+    "/recipes/ingresearch?keyword=garlic,butter&match=any",
+    "/recipes/search?sort=rating",
+    "/recipes/search?sort=rating&vegetarian=false&rating=3",
+    "/recipes/search?ingredients=salt&sort=rating",
+    "/recipes/search?ingredients=onion&vegetarian=true",
+]
+
+
+@pytest.fixture
+def snapshot_path(client, data_dir):
+    path = os.path.join(data_dir, "test.snapshot")
+    yield path
+    for suffix in ("", ".lock"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+
+def _with(url: str, query: str) -> str:
+    # A params argument would replace the query string already in `url`
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def _serve(monkeypatch, snapshot: Snapshot | None):
+    # Cache keys do not say where a result came from
+    query_cache.invalidate()
+    monkeypatch.setattr(snapshot_server, "current", snapshot)
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_pages_match_database_mode(client, snapshot_path, monkeypatch, url):
+    from db import engine
+
+    build(engine, snapshot_path)
+    snapshot = Snapshot(snapshot_path)
+    try:
+        first_page = client.get(_with(url, "limit=25"))
+        from_database = walk(client, url, 25)
+        streamed = client.get(_with(url, "stream=true")).content
+        _serve(monkeypatch, snapshot)
+        page = client.get(_with(url, "limit=25"))
+        assert page.content == first_page.content
+        assert page.headers.get("X-Next-Cursor") == first_page.headers.get("X-Next-Cursor")
+        assert walk(client, url, 25) == from_database
+        assert client.get(_with(url, "stream=true")).content == streamed
+    finally:
+        _serve(monkeypatch, None)
+
+
+def test_get_matches_database_mode(client, snapshot_path, monkeypatch):
+    from db import engine
+
+    ids = [recipe["id"] for recipe in client.get("/recipes/", params={"limit": 20}).json()]
+    build(engine, snapshot_path)
+    from_database = [client.get(f"/recipes/{recipe_id}").content for recipe_id in ids]
+    try:
+        _serve(monkeypatch, Snapshot(snapshot_path))
+        assert [client.get(f"/recipes/{recipe_id}").content for recipe_id in ids] == from_database
+        assert client.get("/recipes/999999999").status_code == 404
+    finally:
+        _serve(monkeypatch, None)
+
+
+class _Recorder:
+    def __init__(self):
+        self.saved, self.removed = {}, []
+
+    def recipes_saved(self, recipes):
+        self.saved.update((recipe.id, recipe) for recipe in recipes)
+
+    def recipes_removed(self, recipe_ids):
+        self.removed += recipe_ids
+
+
+def test_replay_announces_only_what_changed(client, snapshot_path, monkeypatch):
+    from db import engine
+
+    # Not the newest: SQLite hands the highest rowid out again once it is deleted
+    deleted, kept, changed = (
+        client.post("/recipes/", json=recipe_body(f"Replay {name}", ["1 carrot"])).json()["id"]
+        for name in ("deleted", "kept", "changed")
+    )
+    build(engine, snapshot_path)
+    before = Snapshot(snapshot_path)
+
+    client.put(f"/recipes/{changed}", json=recipe_body("Replay changed", ["1 carrot", "2 quince"], rating=None))
+    client.delete(f"/recipes/{deleted}")
+    created = client.post("/recipes/", json=recipe_body("Replay created", ["1 quince"])).json()["id"]
+    os.unlink(snapshot_path)
+    build(engine, snapshot_path)
+    after = Snapshot(snapshot_path)
+
+    recorder, replayed = _Recorder(), FacetIndex()
+    monkeypatch.setattr(catalog, "_listeners", [recorder, replayed])
+    SnapshotServer._replay(None, before)
+    assert {kept, changed, deleted} <= recorder.saved.keys()
+    recorder.saved.clear()
+
+    SnapshotServer._replay(before, after)
+    assert recorder.removed == [deleted]
+    assert sorted(recorder.saved) == sorted([changed, created])
+    assert recorder.saved[changed].ingredients == ("1 carrot", "2 quince")
+    assert recorder.saved[changed].rating is None
+
+    # Replaying the difference leaves a listener as if it had loaded the new snapshot
+    fresh = FacetIndex()
+    monkeypatch.setattr(catalog, "_listeners", [fresh])
+    SnapshotServer._replay(None, after)
+    for filters in ({}, {"vegetarian": False}, {"rating": 4.0}, {"ids": {kept, changed, created}}):
+        assert replayed.facets(**filters) == fresh.facets(**filters)
+
+
+def test_server_picks_up_writes(client, snapshot_path, monkeypatch):
+    from db import engine
+
+    monkeypatch.setattr(settings, "SNAPSHOT_RELOAD_SECONDS", 0.05)
+    server = SnapshotServer()
+    server.start(engine, snapshot_path)
+    try:
+        recipe_id = client.post("/recipes/", json=recipe_body("Watcher pie", ["1 medlar"])).json()["id"]
+        deadline = time.monotonic() + 10
+        while server.current.get(recipe_id) is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert server.current.get(recipe_id) == client.get(f"/recipes/{recipe_id}").content
+
+        client.delete(f"/recipes/{recipe_id}")
+        deadline = time.monotonic() + 10
+        while server.current.get(recipe_id) is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert server.current.get(recipe_id) is None
+    finally:
+        server.stop()
+        catalog._listeners.remove(server)
+
+
+def test_writing_worker_reads_its_own_writes(client, snapshot_path, monkeypatch):
+    import routers.recipes
+    from db import engine
+
+    # No rebuild happens on its own during the test
+    monkeypatch.setattr(settings, "SNAPSHOT_RELOAD_SECONDS", 3600)
+    changed, deleted = (
+        client.post("/recipes/", json=recipe_body(f"Own {name}", ["1 loquat"])).json()["id"] for name in ("pie", "tart")
+    )
+    server = SnapshotServer()
+    server.start(engine, snapshot_path)
+    monkeypatch.setattr(routers.recipes, "snapshot_server", server)
+    query_cache.invalidate()
+    try:
+        assert server.serving() is server.current
+        updated = client.put(f"/recipes/{changed}", json=recipe_body("Own pie", ["1 kumquat"])).content
+        assert client.delete(f"/recipes/{deleted}").status_code == 204
+
+        assert client.get(f"/recipes/{changed}").content == updated
+        assert client.get(f"/recipes/{deleted}").status_code == 404
+        search = "/recipes/ingresearch?keyword=loquat,kumquat&match=any"
+        assert [recipe["id"] for recipe in client.get(search).json()] == [changed]
+        assert server.serving() is None
+
+        # Once a snapshot with the writes is mapped, it serves again
+        build(engine, snapshot_path)
+        server._load()
+        assert server.serving() is server.current
+        assert server.current.get(changed) == updated
+        assert client.get(f"/recipes/{deleted}").status_code == 404
+        assert [recipe["id"] for recipe in client.get(search).json()] == [changed]
+    finally:
+        server.stop()
+        catalog._listeners.remove(server)
+        client.delete(f"/recipes/{changed}")